@@ -0,0 +1,156 @@
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify, abort
+from flask.json.provider import DefaultJSONProvider
+from models import Venue, Artist, Show, venue_genre_table, artist_genre_table
+from queries import (
+    VENUE_FIELDS, ARTIST_FIELDS, SHOW_FIELDS,
+    venues_query, artists_query, shows_query, venue_shows_query, artist_shows_query
+)
+from genres import genre_names
+from pagination import keyset_page, get_page_size
+from conditional import conditional, venue_validator, artist_validator, venues_validator, artists_validator, shows_validator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# Read-only JSON API (/api/v1).
+#
+# The endpoints run the projected queries of the HTML pages (queries.py),
+# select only the columns named in ?fields= (all by default), page with the
+# same keyset cursors and answer conditional requests like the pages do.
+#----------------------------------------------------------------------------#
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON through orjson when it is installed.
+
+    Dates are written in ISO 8601 by both encoders and keys keep their
+    order, so the output does not depend on whether orjson is there.
+    """
+
+    sort_keys = False
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        return DefaultJSONProvider.default(value)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {'indent', 'separators'}:
+            option = orjson.OPT_NON_STR_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# shows listed on the detail of a venue or artist
+VENUE_SHOW_FIELDS = ['start_time', 'artist_id', 'artist_name', 'artist_image_link']
+ARTIST_SHOW_FIELDS = ['start_time', 'venue_id', 'venue_name', 'venue_image_link']
+
+
+def selected_fields(available):
+    """Field names requested with ?fields=a,b (all by default), 400 on unknown names."""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        response = jsonify({'error': 'unknown fields: ' + ', '.join(unknown), 'fields': list(available)})
+        response.status_code = 400
+        abort(response)
+    return list(dict.fromkeys(names))
+
+
+def _listing(query, fields, keys, genres=None):
+    """A page of query as JSON, genres=(link table, owner column) adds genres."""
+    available = list(fields) + (['genres'] if genres else [])
+    names = selected_fields(available)
+    columns = [name for name in names if name in fields]
+    page = keyset_page(query(columns, keys), keys,
+                       after=request.args.get('after'),
+                       before=request.args.get('before'),
+                       page_size=get_page_size(request.args.get('per_page')))
+    genres_by_id = genre_names(*genres, [row.id for row in page]) if 'genres' in names else {}
+    data = []
+    for row in page:
+        item = {name: getattr(row, name) for name in columns}
+        if 'genres' in names:
+            item['genres'] = genres_by_id.get(row.id, [])
+        data.append(item)
+    return jsonify({
+        'data': data,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+def _detail(query, fields, id_column, id, genres, shows_query, show_fields):
+    """One venue or artist with its genres and past/upcoming shows."""
+    available = list(fields) + ['genres', 'past_shows', 'upcoming_shows']
+    names = selected_fields(available)
+    columns = [name for name in names if name in fields]
+    row = query(columns, [id_column]).filter(id_column == id).first()
+    if row is None:
+        return jsonify({'error': 'not found'}), 404
+    item = {name: getattr(row, name) for name in columns}
+    if 'genres' in names:
+        item['genres'] = genre_names(*genres, [id]).get(id, [])
+    if 'past_shows' in names or 'upcoming_shows' in names:
+        now = datetime.now()
+        past, upcoming = [], []
+        for show in shows_query(id, show_fields):
+            (past if show.start_time <= now else upcoming).append(dict(show._mapping))
+        if 'past_shows' in names:
+            item['past_shows'] = past
+        if 'upcoming_shows' in names:
+            item['upcoming_shows'] = upcoming
+    return jsonify(item)
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+@conditional(venues_validator)
+def venues():
+    return _listing(venues_query, VENUE_FIELDS, [Venue.name, Venue.id],
+                    genres=(venue_genre_table, 'venue_id'))
+
+
+@api.route('/venues/<int:venue_id>')
+@conditional(venue_validator)
+def venue(venue_id):
+    return _detail(venues_query, VENUE_FIELDS, Venue.id, venue_id, (venue_genre_table, 'venue_id'),
+                   venue_shows_query, VENUE_SHOW_FIELDS)
+
+
+@api.route('/artists')
+@conditional(artists_validator)
+def artists():
+    return _listing(artists_query, ARTIST_FIELDS, [Artist.name, Artist.id],
+                    genres=(artist_genre_table, 'artist_id'))
+
+
+@api.route('/artists/<int:artist_id>')
+@conditional(artist_validator)
+def artist(artist_id):
+    return _detail(artists_query, ARTIST_FIELDS, Artist.id, artist_id, (artist_genre_table, 'artist_id'),
+                   artist_shows_query, ARTIST_SHOW_FIELDS)
+
+
+@api.route('/shows')
+@conditional(shows_validator)
+def shows():
+    return _listing(shows_query, SHOW_FIELDS, [Show.time, Show.id])
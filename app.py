@@ -3,12 +3,17 @@
 #----------------------------------------------------------------------------#
 
 import json
+import functools
 import dateutil.parser
 import babel
+import babel.dates
 from flask import (
   Flask, 
   render_template, 
   request, Response, 
+  jsonify,
+  stream_with_context,
+  stream_template,
   flash, 
   redirect, 
   url_for
@@ -16,13 +21,33 @@ from flask import (
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import tuple_, func
+from sqlalchemy.orm import selectinload
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm as Form
 from flask_migrate import Migrate
 from forms import *
-from datetime import datetime
-from models import db, Genre, Venue, Artist, Show    
+from datetime import datetime, timezone
+from models import db, Genre, Venue, Artist, Show, venue_genre_table, artist_genre_table, utcnow
+from genres import resolve_genre_ids, add_genres, replace_genres
+from pagination import keyset_page, keyset_stream, get_page_size
+from jinja2.environment import TemplateStream
+from search import search_entities
+from queries import VENUE_AREA_ORDER, venues_query, artists_query, shows_query, venue_shows_query, artist_shows_query
+from conditional import conditional, apply_cache_control, venue_validator, artist_validator, venues_validator, artists_validator, shows_validator
+from counters import count_new_show, delete_shows, touch_counterparts, counters_cli
+from importer import import_command
+from exporter import export_chunks, gzipped, export_command, FORMATS
+from seed import seed_command
+from instrumentation import sql_instrumentation
+from metrics import metrics
+from slowlog import slow_query_log, slow_queries_command
+from profiler import request_profiler
+from pool import engine_options, admin_pool
+from replicas import replica_router
+from api import api, FastJSONProvider
+from cache import page_cache
+from suggest import get_index, build_indexes, update_suggestion, remove_suggestion, SUGGEST_TYPES
 import sys
 #----------------------------------------------------------------------------#
 # App Config.
@@ -31,7 +56,23 @@ import sys
 app = Flask(__name__)
 app.config.from_object('config')
 moment = Moment(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 db.init_app(app)
+replica_router.init_app(app)
+page_cache.init_app(app)
+sql_instrumentation.init_app(app)
+metrics.init_app(app)
+slow_query_log.init_app(app)
+request_profiler.init_app(app)
+app.add_url_rule('/admin/pool', 'admin_pool', admin_pool)
+app.after_request(apply_cache_control)
+app.cli.add_command(counters_cli)
+app.cli.add_command(import_command)
+app.cli.add_command(export_command)
+app.cli.add_command(seed_command)
+app.cli.add_command(slow_queries_command)
+app.json = FastJSONProvider(app)
+app.register_blueprint(api)
 migrate = Migrate(app, db)
 
 
@@ -39,16 +80,56 @@ migrate = Migrate(app, db)
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  #babel pattern and locale, parsed once per format/locale
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale=None):
+  #a frame of its own on every call, so profiles count the filter (profiler.py)
+  return formatted_datetime(value, format, locale)
+
+#shows repeat the same few times, the memo is bounded to keep memory flat
+@functools.lru_cache(maxsize=4096)
+def formatted_datetime(value, format, locale):
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+  pattern, locale = datetime_pattern(format, locale or babel.dates.LC_TIME)
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Listing pages, buffered or streamed (LISTING_RENDERING).
+#----------------------------------------------------------------------------#
+
+def streamed_listings():
+  return app.config.get('LISTING_RENDERING', 'buffered') == 'streamed'
+
+def listing_page(query, columns):
+  #streamed pages read their rows while the template renders them
+  paging = dict(after=request.args.get('after'),
+                before=request.args.get('before'),
+                page_size=get_page_size(request.args.get('per_page')))
+  if streamed_listings():
+    return keyset_stream(query, columns, **paging)
+  return keyset_page(query, columns, **paging)
+
+def render_listing(template, **context):
+  if streamed_listings():
+    #the header goes out right away, then the rows in chunks
+    stream = TemplateStream(stream_template(template, **context))
+    stream.enable_buffering(app.config.get('STREAM_BUFFER_SIZE', 40))
+    return Response(stream, mimetype='text/html')
+  return render_template(template, **context)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -63,99 +144,127 @@ def index():
 # Display Venues
 # --------------------------------------
 @app.route('/venues')
+@conditional(venues_validator)
 def venues():
-  locals = []
-  venues = Venue.query.all()
-  places = Venue.query.distinct(Venue.city, Venue.state).all()
-
-  for place in places:
-      locals.append({
-          'city': place.city,
-          'state': place.state,
-          'venues': [{
-              'id': venue.id,
-              'name': venue.name,
-              'num_upcoming_shows': len([show for show in venue.shows if show.time > datetime.now()])
-          } for venue in venues if
-              venue.city == place.city and venue.state == place.state]
-      })
-  return render_template('pages/venues.html', areas=locals)
+  areas = []
+  # the number of upcoming shows is kept on the venue row (see counters.py)
+  query = venues_query(['city', 'state', 'id', 'name', 'num_upcoming_shows'], VENUE_AREA_ORDER)
+  page = keyset_page(query, VENUE_AREA_ORDER,
+                     after=request.args.get('after'),
+                     before=request.args.get('before'),
+                     page_size=get_page_size(request.args.get('per_page')))
+
+  # pages are cut in area order, so the rows arrive grouped by area and
+  # an area only spans pages when it has more venues than fit on one
+  area = None
+  for row in page:
+    if area is None or area['city'] != row.city or area['state'] != row.state:
+      area = {
+        'city': row.city,
+        'state': row.state,
+        'venues': []
+      }
+      areas.append(area)
+    area['venues'].append({
+      'id': row.id,
+      'name': row.name,
+      'num_upcoming_shows': row.num_upcoming_shows
+    })
+  return render_template('pages/venues.html', areas=areas, page=page, page_args={})
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-  search = request.form['search_term']
-  venues = db.session.query(Venue).filter(Venue.name.ilike('%'+search+'%')).all()
+  search = request.values.get('search_term', '')
+  page, count = search_entities(Venue, search,
+                                after=request.args.get('after'),
+                                before=request.args.get('before'),
+                                page_size=get_page_size(request.args.get('per_page')))
   data = []
   # create file for all results
-  for venue in venues:
+  for venue in page:
     data.append({
       "id": venue.id,
       "name": venue.name,
-      #"num_upcoming_shows": 0, len(db.session.query(Show).filter(Show.venue_id == v.id).filter(Show.start_time > datetime.now()).all()),
+      "num_upcoming_shows": venue.num_upcoming_shows,
     })
   #create response message with count on results
   response={
-    "count": len(venues),
+    "count": count,
     "data": data
   }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=response, search_term=search,
+                         page=page, page_args={'search_term': search})
+
+def render_venue_page(cache_key, venue, genres, past_shows, upcoming_shows):
+  """Render and cache the page of a venue from its row, genre names and show rows."""
+  data={
+    "id": venue.id,
+    "name": venue.name,
+    "genres": genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website" : venue.website, 
+    "facebook_link": venue.facebook_link,
+    "image_link": venue.image_link,
+    "seeking": venue.seeking,
+    "seeking_description": venue.seeking_description,
+    "past_shows": [],
+    "upcoming_shows": [],
+  }
+  for key, shows in (("past_shows", past_shows), ("upcoming_shows", upcoming_shows)):
+    for show in shows:
+      data[key].append({
+        "artist_id": show.artist_id,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time" : show.start_time,
+      })
+  data["past_shows_count"] = len(data["past_shows"])
+  data["upcoming_shows_count"] = len(data["upcoming_shows"])
+
+  page = render_template('pages/show_venue.html', venue=data)
+  # the page is stale once its first upcoming show has started
+  page_cache.set(cache_key, page, expires_at=upcoming_shows[0].start_time if upcoming_shows else None)
+  return page
 
 @app.route('/venues/<int:venue_id>')
+@conditional(venue_validator)
 def show_venue(venue_id):
-  venue = Venue.query.get(venue_id)
+  cache_key = page_cache.key('venue', venue_id)
+  page = page_cache.get(cache_key)
+  if page is not None:
+    return page
+  venue = db.session.get(Venue, venue_id, options=[selectinload(Venue.genres)])
   # If venue with this id is not existing, go to home and flash an error message
   if not venue:
      flash('Venue with ID ' + str(venue_id) + ' is not existing')
      return render_template('pages/home.html')
-  else:
-    #get name of genres
-    genres = [ genre.name for genre in venue.genres ]
-    #get current date + time
-    current_time = datetime.now()
-    #filter fo past shows                               
-    past_shows = db.session.query(Show).join(Venue).filter(venue_id==Show.venue_id).filter(Show.time < current_time).all()
-    #filter for upcoming shows
-    upcoming_shows = db.session.query(Show).join(Venue).filter(venue_id==Show.venue_id).filter(Show.time > current_time).all()
-    
-    data={
-      "id": venue.id,
-      "name": venue.name,
-      "genres": genres,
-      "address": venue.address,
-      "city": venue.city,
-      "state": venue.state,
-      "phone": venue.phone,
-      "website" : venue.website, 
-      "facebook_link": venue.facebook_link,
-      "image_link": venue.image_link,
-      "seeking": venue.seeking,
-      "seeking_description": venue.seeking_description,
-      "past_shows":[],
-      "upcoming_shows":[],
-      "past_shows_count" : len(past_shows),
-      "upcoming_shows_count" : len(upcoming_shows),
-    }
-    print(venue.seeking, file=sys.stderr)
-    #add the data for past shows
-    for show in past_shows:
-        show_data = {
-          "venue_id": show.artist.id,
-          "venue_name": show.artist.name,
-          "venue_image_link": show.artist.image_link,
-          "start_time" : str(show.time),
-        }
-        data["past_shows"].append(show_data)
-    #add the data for upcoming shows
-    for show in upcoming_shows:
-        show_data = {
-          "venue_id": show.artist.id,
-          "venue_name": show.artist.name,
-          "venue_image_link": show.artist.image_link,
-          "start_time" : str(show.time),
-        }
-        data["upcoming_shows"].append(show_data)
-
-  return render_template('pages/show_venue.html', venue=data)
+  #get name of genres
+  genres = [ genre.name for genre in venue.genres ]
+  #get current date + time
+  current_time = datetime.now()
+  #all shows of the venue with the artist columns in one query, ordered by time,
+  #split into past and upcoming ones in a single pass
+  past_shows, upcoming_shows = [], []
+  for show in venue_shows_query(venue_id, ['start_time', 'artist_id', 'artist_name', 'artist_image_link']):
+    if show.start_time < current_time:
+      past_shows.append(show)
+    elif show.start_time > current_time:
+      upcoming_shows.append(show)
+  return render_venue_page(cache_key, venue, genres, past_shows, upcoming_shows)
+
+#  Autocomplete
+#  ----------------------------------------------------------------
+@app.route('/api/suggest')
+def suggest():
+  prefix = request.args.get('q', '')
+  type = request.args.get('type', 'venue')
+  if type not in SUGGEST_TYPES:
+    return jsonify({'error': 'type must be one of ' + ', '.join(SUGGEST_TYPES)}), 400
+  limit = max(1, min(request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int), app.config['MAX_PAGE_SIZE']))
+  return jsonify({'results': get_index(type).suggest(prefix, limit)})
 
 #  CREATE Venue
 #  ----------------------------------------------------------------
@@ -183,23 +292,15 @@ def create_venue_submission():
       seeking_description = request.form['seeking_description']
       venue = Venue(name=name, city=city, state=state, address=address, phone=phone, website=website, facebook_link=facebook_link, image_link=image_link, seeking=seeking, seeking_description=seeking_description)
 
+      db.session.add(venue)
+      db.session.flush()
+      venue_id = venue.id
       #Genre must be handled different because it is a list
+      #resolve the names through the genre cache and link them in one insert
       genres = request.form.getlist('genres')
-      
-      for genre in genres:
-        #check if genre already existing
-        genre_existing = Genre.query.filter_by(name=genre).one_or_none()  
-        if genre_existing:
-          #the genre is existing, just add to the list
-          venue.genres.append(genre_existing)
-        else:
-          #create the genre item and append it
-          new_genre = Genre(name=genre)
-          db.session.add(new_genre)
-          venue.genres.append(new_genre)  
-    
-      db.session.add(venue)
+      add_genres(venue_genre_table, 'venue_id', venue_id, resolve_genre_ids(genres))
       db.session.commit()
+      update_suggestion('venue', venue_id, name)
     except ValueError as e:
       error = True
       db.session.rollback()
@@ -258,21 +359,15 @@ def edit_venue_submission(venue_id):
       venue_to_edit.image_link = request.form['image_link']
       venue_to_edit.seeking = True if 'seeking' in request.form else False 
       venue_to_edit.seeking_description = request.form['seeking_description']
+      #genre changes alone do not update the row, so stamp it here
+      venue_to_edit.updated_at = utcnow()
       genres = request.form.getlist('genres')
       
-      for genre in genres:
-        #check if genre already existing
-        genre_existing = Genre.query.filter_by(name=genre).one_or_none()  
-        if genre_existing:
-          #the genre is existing, just add to the list
-          venue_to_edit.genres.append(genre_existing)
-        else:
-          #create the genre item and append it
-          new_genre = Genre(name=genre)
-          db.session.add(new_genre)
-          venue_to_edit.genres.append(new_genre)  
+      replace_genres(venue_genre_table, 'venue_id', venue_id, resolve_genre_ids(genres))
+      touch_counterparts(Venue, venue_id)
       db.session.add(venue_to_edit)
       db.session.commit()
+      update_suggestion('venue', venue_id, request.form['name'])
     except:
       error = True
       db.session.rollback()
@@ -301,8 +396,11 @@ def delete_venue(venue_id):
   try:
     venue = Venue.query.get(venue_id)
     body['name'] = venue.name
+    #the venue's shows go with it, off the artists' counters
+    delete_shows(Show.venue_id == venue.id)
     db.session.delete(venue)
     db.session.commit()
+    remove_suggestion('venue', int(venue_id))
   except:
     error = True
     db.session.rollback()
@@ -322,85 +420,93 @@ def delete_venue(venue_id):
 # Display Artists
 # --------------------------------------
 @app.route('/artists')
+@conditional(artists_validator)
 def artists():
-  return render_template('pages/artists.html', artists=Artist.query.order_by(Artist.name).all())
+  page = listing_page(artists_query(['id', 'name']), [Artist.name, Artist.id])
+  return render_listing('pages/artists.html', artists=page, page=page, page_args={})
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-  search = request.form['search_term']
-  artists = db.session.query(Artist).filter(Artist.name.ilike('%'+search+'%')).all()
+  search = request.values.get('search_term', '')
+  page, count = search_entities(Artist, search,
+                                after=request.args.get('after'),
+                                before=request.args.get('before'),
+                                page_size=get_page_size(request.args.get('per_page')))
   data = []
   # create file for all results
-  for artist in artists:
+  for artist in page:
     data.append({
       "id": artist.id,
       "name": artist.name,
-      #"num_upcoming_shows": 0, len(db.session.query(Show).filter(Show.venue_id == v.id).filter(Show.start_time > datetime.now()).all()),
+      "num_upcoming_shows": artist.num_upcoming_shows,
     })
   #create response message with count on results
   response={
-    "count": len(artists),
+    "count": count,
     "data": data
   }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search,
+                         page=page, page_args={'search_term': search})
+
+def render_artist_page(cache_key, artist, genres, past_shows, upcoming_shows):
+  """Render and cache the page of an artist from its row, genre names and show rows."""
+  data={
+    "id": artist.id,
+    "name": artist.name,
+    "genres": genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "image_link" : artist.image_link,
+    "seeking" : artist.seeking,
+    "seeking_description" : artist.seeking_description,
+    "past_shows": [],
+    "upcoming_shows": [],
+  }
+  for key, shows in (("past_shows", past_shows), ("upcoming_shows", upcoming_shows)):
+    for show in shows:
+      data[key].append({
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
+        "venue_image_link": show.venue_image_link,
+        "start_time" : show.start_time,
+      })
+  data["past_shows_count"] = len(data["past_shows"])
+  data["upcoming_shows_count"] = len(data["upcoming_shows"])
+
+  page = render_template('pages/show_artist.html', artist=data)
+  # the page is stale once its first upcoming show has started
+  page_cache.set(cache_key, page, expires_at=upcoming_shows[0].start_time if upcoming_shows else None)
+  return page
 
 @app.route('/artists/<int:artist_id>')
+@conditional(artist_validator)
 def show_artist(artist_id):
+  cache_key = page_cache.key('artist', artist_id)
+  page = page_cache.get(cache_key)
+  if page is not None:
+    return page
   # Search for item by primary key ID in database
-  artist = Artist.query.get(artist_id)
+  artist = db.session.get(Artist, artist_id, options=[selectinload(Artist.genres)])
   # If artist with this id is not existing, go to home a flash message
   if not artist:
      flash('Artist with ID ' + str(artist_id) + ' is not existing')
      return render_template('pages/home.html')
-  else:
-    # get genre names
-    genres = [ genre.name for genre in artist.genres ]
-    # get all shows of the artist
-    shows = db.session.query(Show).filter_by(artist_id=artist_id)
-    # get current date + time
-    current_time = datetime.now()
-    # filter fo past shows                              
-    past_shows = db.session.query(Show).join(Venue).filter(artist_id==Show.artist_id).filter(Show.time < current_time).all()
-    #filter for upcoming shows
-    upcoming_shows = db.session.query(Show).join(Venue).filter(artist_id==Show.artist_id).filter(Show.time > current_time).all()
-    #Create data
-    data={
-      "id": artist.id,
-      "name": artist.name,
-      "genres": genres,
-      "city": artist.city,
-      "state": artist.state,
-      "phone": artist.phone,
-      "website": artist.website,
-      "facebook_link": artist.facebook_link,
-      "image_link" : artist.image_link,
-      "seeking" : artist.seeking,
-      "seeking_description" : artist.seeking_description,
-      "past_shows":[],
-      "upcoming_shows":[],
-      "past_shows_count" : len(past_shows),
-      "upcoming_shows_count" : len(upcoming_shows),
-    }
-    #add the data for past shows
-    for show in past_shows:
-        show_data = {
-          "venue_id": show.venue.id,
-          "venue_name": show.venue.name,
-          "venue_image_link": show.venue.image_link,
-          "start_time" : str(show.time),
-        }
-        data["past_shows"].append(show_data)
-    #add the data for upcoming shows
-    for show in upcoming_shows:
-        show_data = {
-          "venue_id": show.venue.id,
-          "venue_name": show.venue.name,
-          "venue_image_link": show.venue.image_link,
-          "start_time" : str(show.time),
-        }
-        data["upcoming_shows"].append(show_data)
-
-  return render_template('pages/show_artist.html', artist=data)
+  # get genre names
+  genres = [ genre.name for genre in artist.genres ]
+  # get current date + time
+  current_time = datetime.now()
+  # all shows of the artist with the venue columns in one query, ordered by time,
+  # split into past and upcoming ones in a single pass
+  past_shows, upcoming_shows = [], []
+  for show in artist_shows_query(artist_id, ['start_time', 'venue_id', 'venue_name', 'venue_image_link']):
+    if show.start_time < current_time:
+      past_shows.append(show)
+    elif show.start_time > current_time:
+      upcoming_shows.append(show)
+  return render_artist_page(cache_key, artist, genres, past_shows, upcoming_shows)
 
 #  Update Artists
 #  ----------------------------------------------------------------
@@ -440,22 +546,16 @@ def edit_artist_submission(artist_id):
       artist_to_edit.image_link = request.form['image_link']
       artist_to_edit.seeking = True if 'seeking' in request.form else False 
       artist_to_edit.seeking_description = request.form['seeking_description']
+      #genre changes alone do not update the row, so stamp it here
+      artist_to_edit.updated_at = utcnow()
       genres = request.form.getlist('genres')
       
-      for genre in genres:
-        #check if genre already existing
-        genre_existing = Genre.query.filter_by(name=genre).one_or_none()  
-        if genre_existing:
-          #the genre is existing, just add to the list
-          artist_to_edit.genres.append(genre_existing)
-        else:
-          #create the genre item and append it
-          new_genre = Genre(name=genre)
-          db.session.add(new_genre)
-          artist_to_edit.genres.append(new_genre)  
+      replace_genres(artist_genre_table, 'artist_id', artist_id, resolve_genre_ids(genres))
+      touch_counterparts(Artist, artist_id)
 
       db.session.add(artist_to_edit)
       db.session.commit()
+      update_suggestion('artist', artist_id, request.form['name'])
     except:
       error = True
       db.session.rollback()
@@ -510,20 +610,12 @@ def create_artist_submission():
 
       genres = request.form.getlist('genres')
       
-      for genre in genres:
-        #check if genre already existing
-        genre_existing = Genre.query.filter_by(name=genre).one_or_none()  
-        if genre_existing:
-          #the genre is existing, just add to the list
-          artist.genres.append(genre_existing)
-        else:
-          #create the genre item and append it
-          new_genre = Genre(name=genre)
-          db.session.add(new_genre)
-          artist.genres.append(new_genre)  
-
       db.session.add(artist)
+      db.session.flush()
+      artist_id = artist.id
+      add_genres(artist_genre_table, 'artist_id', artist_id, resolve_genre_ids(genres))
       db.session.commit()
+      update_suggestion('artist', artist_id, name)
     except:
       error = True
       db.session.rollback()
@@ -551,8 +643,11 @@ def delete_artist(artist_id):
   try:
     artist = Artist.query.get(artist_id)
     body['name'] = artist.name
+    #the artist's shows go with it, off the venues' counters
+    delete_shows(Show.artist_id == artist_id)
     db.session.delete(artist)
     db.session.commit()
+    remove_suggestion('artist', artist_id)
   except:
     error = True
     db.session.rollback()
@@ -569,20 +664,21 @@ def delete_artist(artist_id):
 #  Shows
 #  ----------------------------------------------------------------
 @app.route('/shows')
+@conditional(shows_validator)
 def shows():
-  data=[]
-  shows=Show.query.all()
-  for show in shows:
-    show_data ={
-    "venue_id": show.venue.id,
-    "venue_name": show.venue.name,
-    "artist_id": show.artist.id,
-    "artist_name": show.artist.name,
-    "artist_image_link": show.artist.image_link,
-    "start_time": str(show.time),
-    }
-    data.append(show_data)
-  return render_template('pages/shows.html', shows=data)
+  query = shows_query(['id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link'],
+                      [Show.time, Show.id])
+  page = listing_page(query, [Show.time, Show.id])
+  #a generator, so a streamed page builds each tile while it is sent
+  data = ({
+    "venue_id": show.venue_id,
+    "venue_name": show.venue_name,
+    "artist_id": show.artist_id,
+    "artist_name": show.artist_name,
+    "artist_image_link": show.artist_image_link,
+    "start_time": show.start_time,
+    } for show in page)
+  return render_listing('pages/shows.html', shows=data, page=page, page_args={})
 
 @app.route('/shows/create', methods=['GET'])
 def create_shows():
@@ -597,9 +693,10 @@ def create_show_submission():
     try:
       artist_id = request.form['artist_id']
       venue_id = request.form['venue_id']
-      time= request.form['start_time']
+      time = formvalidation.start_time.data
       show = Show(artist_id=artist_id, venue_id=venue_id, time=time)
       db.session.add(show)
+      count_new_show(int(venue_id), int(artist_id), formvalidation.start_time.data)
       db.session.commit()
     except:
       error = True
@@ -619,6 +716,19 @@ def create_show_submission():
         message.append(field + ' ' + '|'.join(err))
     flash('Errors ' + str(message))
     return render_template('pages/home.html')
+
+#  Export
+#  ----------------------------------------------------------------
+@app.route('/export/<any(venue, artist, show):entity>.<any(ndjson, csv):format>')
+def export(entity, format):
+  chunks = export_chunks(entity, format)
+  headers = {'Content-Disposition': 'attachment; filename=%s.%s' % (entity, format), 'Vary': 'Accept-Encoding'}
+  #compressed on the fly when the client takes gzip
+  if 'gzip' in request.accept_encodings:
+    chunks = gzipped(chunks)
+    headers['Content-Encoding'] = 'gzip'
+  return Response(stream_with_context(chunks), mimetype=FORMATS[format], headers=headers)
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -644,6 +754,8 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
+    with app.app_context():
+        build_indexes()
     app.run()
 
 # Or specify port manually:
@@ -0,0 +1,200 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import g, flash, render_template
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+try:
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+except ImportError:
+    raise RuntimeError('asgi.py needs asgiref and greenlet (pip install "flask[async]" greenlet) '
+                       'plus asyncpg or aiosqlite') from None
+
+from app import app, render_venue_page, render_artist_page
+from cache import page_cache
+from conditional import conditional, venue_validator, artist_validator
+from models import Venue, Artist, Genre, Show, venue_genre_table, artist_genre_table
+from pool import engine_options, TimedAsyncAdaptedQueuePool, TimedNullPool
+from queries import venue_shows_query, artist_shows_query
+from suggest import build_indexes
+
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 4
+#
+# The Flask app is served as before, each request on a thread of a pool of
+# ASGI_THREADS threads. The venue and artist pages are replaced by async
+# views. Their four reads (the row, the genres, the past shows and the
+# upcoming shows) run at the same time on separate connections of an async
+# engine, with asyncio.gather on the server's event loop. Templates,
+# validators, the page cache and the after_request hooks are the ones of the
+# WSGI app. `python app.py` and WSGI servers keep the synchronous views.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+_engines = {}
+_sessions = {}
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def async_engine_options(config):
+    """engine_options() for an async engine, which needs async-adapted pools."""
+    options = engine_options(config)
+    if options.get('poolclass') is not None:
+        # the timed pools of pool.py, in their async-adapted variant
+        options['poolclass'] = TimedNullPool if config.get('DB_PGBOUNCER') else TimedAsyncAdaptedQueuePool
+    if config.get('DB_PGBOUNCER') and config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+        # prepared statements do not survive PgBouncer's transaction pooling
+        options['connect_args'] = {'statement_cache_size': 0}
+    return options
+
+
+def sessionmaker(bind_key=None):
+    """Async sessions for the primary, or for the replica bind of the request."""
+    if bind_key not in _sessions:
+        url = app.config['SQLALCHEMY_BINDS'][bind_key] if bind_key else app.config['SQLALCHEMY_DATABASE_URI']
+        _engines[bind_key] = create_async_engine(async_url(url), **async_engine_options(app.config))
+        _sessions[bind_key] = async_sessionmaker(_engines[bind_key], expire_on_commit=False)
+        # for /admin/pool and the 'least-loaded' replica selection
+        app.extensions.setdefault('async_pools', {})[bind_key] = _engines[bind_key].sync_engine.pool
+    return _sessions[bind_key]
+
+
+async def fetch(statement, one=False):
+    # one session, and so one connection, per statement so they can overlap
+    async with sessionmaker(g.get('db_replica'))() as session:
+        result = await session.execute(statement)
+        return result.scalar_one_or_none() if one else result.all()
+
+
+def genres_of(table, owner_column, owner_id):
+    return select(Genre.name).join(table, table.c.genre_id == Genre.id).where(table.c[owner_column] == owner_id)
+
+#----------------------------------------------------------------------------#
+# Async views.
+#----------------------------------------------------------------------------#
+
+async def show_venue(venue_id):
+    cache_key = page_cache.key('venue', venue_id)
+    page = page_cache.get(cache_key)
+    if page is not None:
+        return page
+    current_time = datetime.now()
+    shows = venue_shows_query(venue_id, ['start_time', 'artist_id', 'artist_name', 'artist_image_link'])
+    venue, genres, past_shows, upcoming_shows = await asyncio.gather(
+        fetch(select(Venue).where(Venue.id == venue_id), one=True),
+        fetch(genres_of(venue_genre_table, 'venue_id', venue_id)),
+        fetch(shows.filter(Show.time < current_time).statement),
+        fetch(shows.filter(Show.time > current_time).statement))
+    if venue is None:
+        flash('Venue with ID ' + str(venue_id) + ' is not existing')
+        return render_template('pages/home.html')
+    return render_venue_page(cache_key, venue, [name for name, in genres], past_shows, upcoming_shows)
+
+
+async def show_artist(artist_id):
+    cache_key = page_cache.key('artist', artist_id)
+    page = page_cache.get(cache_key)
+    if page is not None:
+        return page
+    current_time = datetime.now()
+    shows = artist_shows_query(artist_id, ['start_time', 'venue_id', 'venue_name', 'venue_image_link'])
+    artist, genres, past_shows, upcoming_shows = await asyncio.gather(
+        fetch(select(Artist).where(Artist.id == artist_id), one=True),
+        fetch(genres_of(artist_genre_table, 'artist_id', artist_id)),
+        fetch(shows.filter(Show.time < current_time).statement),
+        fetch(shows.filter(Show.time > current_time).statement))
+    if artist is None:
+        flash('Artist with ID ' + str(artist_id) + ' is not existing')
+        return render_template('pages/home.html')
+    return render_artist_page(cache_key, artist, [name for name, in genres], past_shows, upcoming_shows)
+
+
+app.view_functions['show_venue'] = conditional(venue_validator)(show_venue)
+app.view_functions['show_artist'] = conditional(artist_validator)(show_artist)
+
+#----------------------------------------------------------------------------#
+# Server.
+#----------------------------------------------------------------------------#
+
+class ThreadedWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """WsgiToAsgiInstance running each request on a thread of the executor.
+
+    asgiref runs every request on one shared thread. Its run_wsgi_app is
+    replaced here rather than re-wrapped, through the public
+    sync_to_async(executor=...), so only build_environ, start_response and
+    the sync_send set up by __call__ are used of the base class. Async views
+    called from these threads run on the event loop.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self.respond, thread_sensitive=False, executor=self.executor)(body)
+
+    def respond(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400,
+                            'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request'})
+            return
+        output = self.wsgi_application(environ, self.start_response)
+        try:
+            sent = 0
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                if self.response_content_length is not None:
+                    # never send more than the Content-Length announced
+                    chunk = chunk[:self.response_content_length - sent]
+                self.sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                sent += len(chunk)
+                if sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(output, 'close'):
+                output.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class FyyurASGI(WsgiToAsgi):
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='fyyur-asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    with app.app_context():
+                        build_indexes()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    for engine in _engines.values():
+                        await engine.dispose()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        await ThreadedWsgiToAsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+
+application = FyyurASGI(app, app.config.get('ASGI_THREADS', 32))
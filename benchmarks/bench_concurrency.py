@@ -0,0 +1,104 @@
+"""Load test of running servers at increasing concurrency.
+
+Keeps N requests in flight against each target for --duration seconds per
+concurrency level and reports throughput and latency percentiles. Compare
+the WSGI app with the ASGI entry point (asgi.py) on the same database:
+
+    gunicorn -w 4 --threads 8 -b :8001 app:app
+    uvicorn asgi:application --workers 4 --port 8002
+    python benchmarks/bench_concurrency.py \\
+        --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002
+
+Paths pick a random id in 1..--ids for each request, so with the default
+paths most requests miss the page cache. Set PAGE_CACHE_ENABLED = False to
+measure the database path alone.
+
+Usage:
+    python benchmarks/bench_concurrency.py --target NAME=URL [--target ...]
+        [--paths /venues/{id},/artists/{id}] [--ids 1000]
+        [--concurrency 1,16,64,256] [--duration 10] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def get(host, port, path):
+  """One GET on a new connection, returns the status code."""
+  reader, writer = await asyncio.open_connection(host, port)
+  try:
+    writer.write(('GET %s HTTP/1.1\r\nHost: %s:%d\r\nConnection: close\r\n\r\n' % (path, host, port)).encode('ascii'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    while await reader.read(65536):
+      pass
+    return status
+  finally:
+    writer.close()
+
+
+async def load(url, paths, ids, concurrency, duration):
+  parts = urlsplit(url)
+  host, port = parts.hostname, parts.port or 80
+  latencies, errors = [], 0
+  deadline = time.perf_counter() + duration
+
+  async def client():
+    nonlocal errors
+    while time.perf_counter() < deadline:
+      path = random.choice(paths).format(id=random.randint(1, ids))
+      started = time.perf_counter()
+      try:
+        status = await get(host, port, path)
+      except (OSError, ValueError, IndexError):
+        status = None
+      if status == 200:
+        latencies.append(time.perf_counter() - started)
+      else:
+        errors += 1
+
+  started = time.perf_counter()
+  await asyncio.gather(*[client() for _ in range(concurrency)])
+  elapsed = time.perf_counter() - started
+  return {
+    'concurrency': concurrency,
+    'requests': len(latencies),
+    'errors': errors,
+    'rps': round(len(latencies) / elapsed, 1),
+    'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+  }
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--target', action='append', required=True, help='NAME=URL of a running server')
+  parser.add_argument('--paths', default='/venues/{id},/artists/{id}')
+  parser.add_argument('--ids', type=int, default=1000, help='ids are drawn from 1..IDS')
+  parser.add_argument('--concurrency', default='1,16,64,256')
+  parser.add_argument('--duration', type=float, default=10.0, help='seconds per concurrency level')
+  parser.add_argument('--output')
+  args = parser.parse_args()
+
+  paths = args.paths.split(',')
+  results = {}
+  print('%-8s %6s %9s %9s %9s %7s' % ('target', 'conc', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+  for target in args.target:
+    name, url = target.split('=', 1)
+    results[name] = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+      result = asyncio.run(load(url, paths, args.ids, concurrency, args.duration))
+      results[name].append(result)
+      print('%-8s %6d %9.1f %9s %9s %7d' % (name, concurrency, result['rps'], result['p50_ms'],
+                                             result['p99_ms'], result['errors']))
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
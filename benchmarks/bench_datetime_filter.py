@@ -0,0 +1,65 @@
+"""Micro-benchmark for the `datetime` Jinja filter.
+
+Formats a list of show times the way a /shows page does, once with the
+previous filter (str() in the view, dateutil parse and babel's
+format_datetime in the filter) and once with the current one (datetimes,
+precompiled pattern, memo). Reports microseconds per call for the first
+render (cold memo) and for a repeated render (warm memo).
+
+Usage:
+    python benchmarks/bench_datetime_filter.py [--shows 5000] [--distinct 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+from app import format_datetime, formatted_datetime
+
+
+def previous_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def per_call_us(function, values):
+  start = time.perf_counter()
+  for value in values:
+    function(value, 'full')
+  return (time.perf_counter() - start) / len(values) * 1e6
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--shows', type=int, default=5000)
+  parser.add_argument('--distinct', type=int, default=500, help='number of distinct show times')
+  args = parser.parse_args()
+
+  rnd = random.Random(0)
+  start = datetime(2030, 1, 1, 20)
+  times = [start + timedelta(days=rnd.randint(0, 365), minutes=30 * rnd.randint(0, 4))
+           for _ in range(args.distinct)]
+  shows = [rnd.choice(times) for _ in range(args.shows)]
+
+  formatted_datetime.cache_clear()
+  previous = per_call_us(previous_format_datetime, [str(time) for time in shows])
+  cold = per_call_us(format_datetime, shows)
+  warm = per_call_us(format_datetime, shows)
+  print('%-28s %10s' % ('filter', 'us/call'))
+  print('%-28s %10.1f' % ('previous (str + dateutil)', previous))
+  print('%-28s %10.1f  (%.0fx)' % ('current, first render', cold, previous / cold))
+  print('%-28s %10.1f  (%.0fx)' % ('current, repeated render', warm, previous / warm))
@@ -0,0 +1,210 @@
+"""Benchmark suite for every route of the app.
+
+Seeds a throw-away SQLite database (or --database-url) with the synthetic
+dataset of `flask seed` at increasing scales. Each endpoint is driven
+through the Flask test client, and for each one the suite records latency
+percentiles, the number of SQL statements per request and the peak Python
+memory of one request. Results are written as JSON so runs can be
+compared over time.
+
+Usage:
+    python benchmarks/bench_routes.py [--scales 1,10,50] [--runs 20]
+                                      [--output results.json] [--page-cache]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def entity_form(name, **overrides):
+  form = {
+    'name': name,
+    'city': 'Springfield',
+    'state': 'IL',
+    'address': '1 Main St',
+    'phone': '555-555-5555',
+    'image_link': 'https://picsum.photos/300',
+    'genres': ['Jazz', 'Blues'],
+    'facebook_link': 'https://www.facebook.com/bench',
+    'website': 'https://bench.example.com',
+    'seeking': 'y',
+    'seeking_description': 'Looking for talent',
+  }
+  form.update(overrides)
+  return form
+
+
+def endpoints(ids):
+  """(name, method, url, form data) of every route, for the sample ids."""
+  show_form = {'venue_id': str(ids['hot_venue']), 'artist_id': str(ids['hot_artist']),
+               'start_time': '2031-01-01 20:00:00'}
+  return [
+    ('index', 'get', '/', None),
+    ('venues', 'get', '/venues', None),
+    ('show_venue (hot)', 'get', '/venues/%d' % ids['hot_venue'], None),
+    ('show_venue (typical)', 'get', '/venues/%d' % ids['typical_venue'], None),
+    ('artists', 'get', '/artists', None),
+    ('show_artist (hot)', 'get', '/artists/%d' % ids['hot_artist'], None),
+    ('show_artist (typical)', 'get', '/artists/%d' % ids['typical_artist'], None),
+    ('shows', 'get', '/shows', None),
+    ('search_venues', 'post', '/venues/search', {'search_term': 'velvet'}),
+    ('search_artists', 'post', '/artists/search', {'search_term': 'raven'}),
+    ('suggest', 'get', '/api/suggest?type=venue&q=the+bl', None),
+    ('create_venue_form', 'get', '/venues/create', None),
+    ('create_venue_submission', 'post', '/venues/create', entity_form('Bench Venue')),
+    ('edit_venue', 'get', '/venues/%d/edit' % ids['typical_venue'], None),
+    ('edit_venue_submission', 'post', '/venues/%d/edit' % ids['typical_venue'],
+     entity_form('Bench Venue Edited', genres=['Jazz', 'Funk'])),
+    ('create_artist_form', 'get', '/artists/create', None),
+    ('create_artist_submission', 'post', '/artists/create', entity_form('Bench Artist')),
+    ('edit_artist', 'get', '/artists/%d/edit' % ids['typical_artist'], None),
+    ('edit_artist_submission', 'post', '/artists/%d/edit' % ids['typical_artist'],
+     entity_form('Bench Artist Edited', genres=['Pop', 'Soul'])),
+    ('create_shows', 'get', '/shows/create', None),
+    ('create_show_submission', 'post', '/shows/create', show_form),
+    ('api_venues', 'get', '/api/v1/venues', None),
+    ('api_venue', 'get', '/api/v1/venues/%d' % ids['typical_venue'], None),
+    ('api_shows', 'get', '/api/v1/shows?fields=start_time,venue_name,artist_name', None),
+  ]
+
+
+def sample_ids():
+  """The busiest and a median venue and artist by number of shows."""
+  from models import db, Venue, Artist
+  ids = {}
+  for kind, model in (('venue', Venue), ('artist', Artist)):
+    rows = db.session.query(model.id).order_by(
+      (model.upcoming_shows_count + model.past_shows_count).desc(), model.id).all()
+    ids['hot_' + kind] = rows[0].id
+    ids['typical_' + kind] = rows[len(rows) // 2].id
+  return ids
+
+
+def measure(app, statements, method, url, data, runs):
+  client = app.test_client()
+  request = lambda: getattr(client, method)(url, data=data)
+  response = request()  # warm up
+  timings, queries = [], []
+  for _ in range(runs):
+    del statements[:]
+    start = time.perf_counter()
+    response = request()
+    timings.append(time.perf_counter() - start)
+    queries.append(len(statements))
+  # memory in a separate request, tracing slows everything down
+  tracemalloc.start()
+  request()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return {
+    'status': response.status_code,
+    'bytes': len(response.get_data()),
+    'p50_ms': percentile(timings, 0.5) * 1000,
+    'p90_ms': percentile(timings, 0.9) * 1000,
+    'p99_ms': percentile(timings, 0.99) * 1000,
+    'max_ms': max(timings) * 1000,
+    'queries': statistics.median(queries),
+    'peak_kb': peak / 1024.0,
+  }
+
+
+def run(scale, runs, page_cache):
+  from sqlalchemy import event
+  from app import app
+  from models import db
+  from seed import generate
+  from search import reset_memory_indexes
+  from suggest import reset_indexes
+  from cache import page_cache as cache
+
+  app.config['TESTING'] = True
+  cache.enabled = page_cache
+  results = []
+  with app.app_context():
+    db.drop_all()
+    db.create_all()
+    generate(scale, echo=lambda message: None)
+    db.session.commit()
+    db.session.remove()
+    cache.clear()
+    reset_memory_indexes()
+    reset_indexes()
+    ids = sample_ids()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+      for name, method, url, data in endpoints(ids):
+        result = measure(app, statements, method, url, data, runs)
+        result.update({'scale': scale, 'endpoint': name, 'method': method.upper(), 'url': url})
+        results.append(result)
+        print('%6d %-26s %4d %9.1f %9.1f %9.1f %7.0f %9.0f' % (
+          scale, name, result['status'], result['p50_ms'], result['p90_ms'], result['p99_ms'],
+          result['queries'], result['peak_kb']), file=sys.stderr)
+    finally:
+      event.remove(db.engine, 'before_cursor_execute', listener)
+  return results
+
+
+def git_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                   cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--scales', default='1,10,50')
+  parser.add_argument('--runs', type=int, default=20)
+  parser.add_argument('--database-url', help='database to seed, a temporary SQLite file by default')
+  parser.add_argument('--page-cache', action='store_true', help='keep the rendered page cache on')
+  parser.add_argument('--output', help='JSON file to write, standard output by default')
+  args = parser.parse_args()
+
+  db_file = None
+  if args.database_url:
+    config.SQLALCHEMY_DATABASE_URI = args.database_url
+  else:
+    db_file = os.path.join(tempfile.mkdtemp(prefix='fyyur-bench-'), 'bench.db')
+    config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_file
+
+  print('%6s %-26s %4s %9s %9s %9s %7s %9s' % (
+    'scale', 'endpoint', 'code', 'p50 ms', 'p90 ms', 'p99 ms', 'queries', 'peak kb'), file=sys.stderr)
+  results = []
+  for scale in [int(s) for s in args.scales.split(',')]:
+    results += run(scale, args.runs, args.page_cache)
+  report = {
+    'started_at': datetime.now().isoformat(timespec='seconds'),
+    'commit': git_commit(),
+    'python': platform.python_version(),
+    'database': config.SQLALCHEMY_DATABASE_URI.split(':', 1)[0],
+    'runs': args.runs,
+    'page_cache': args.page_cache,
+    'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(report, file, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+  if db_file:
+    os.remove(db_file)
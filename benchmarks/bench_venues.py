@@ -0,0 +1,93 @@
+"""Benchmark for the /venues directory page.
+
+Seeds a throw-away SQLite database with 1k, 10k and 100k venues (two shows
+per venue, half of them upcoming) and reports the number of SQL statements
+and the latency of GET /venues for each size.
+
+Usage:
+    python benchmarks/bench_venues.py [--sizes 1000,10000,100000] [--runs 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='fyyur-bench-'), 'bench.db')
+config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + DB_FILE
+
+from sqlalchemy import event
+from app import app
+from models import db, Venue, Artist, Show
+from counters import recount
+from enums import State
+
+
+def seed(num_venues):
+  db.drop_all()
+  db.create_all()
+  rnd = random.Random(num_venues)
+  states = [state.value for state in State]
+  cities = ['City %d' % i for i in range(max(1, num_venues // 50))]
+  now = datetime.now()
+  db.session.execute(Artist.__table__.insert(), [
+    {'id': i, 'name': 'Artist %d' % i, 'city': rnd.choice(cities), 'state': rnd.choice(states)}
+    for i in range(1, 101)
+  ])
+  db.session.execute(Venue.__table__.insert(), [
+    {'id': i, 'name': 'Venue %d' % i, 'city': rnd.choice(cities), 'state': rnd.choice(states)}
+    for i in range(1, num_venues + 1)
+  ])
+  db.session.execute(Show.__table__.insert(), [
+    {'venue_id': venue_id, 'artist_id': rnd.randint(1, 100),
+     'time': now + timedelta(days=rnd.randint(1, 365) * sign)}
+    for venue_id in range(1, num_venues + 1) for sign in (-1, 1)
+  ])
+  # the shows were inserted directly, bring the venue counters up to date
+  recount()
+  db.session.commit()
+
+
+def run(num_venues, runs):
+  with app.app_context():
+    seed(num_venues)
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+      client = app.test_client()
+      client.get('/venues')  # warm up
+      timings = []
+      for _ in range(runs):
+        del statements[:]
+        start = time.perf_counter()
+        response = client.get('/venues')
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    finally:
+      event.remove(db.engine, 'before_cursor_execute', listener)
+  return {
+    'venues': num_venues,
+    'queries': len(statements),
+    'median_ms': statistics.median(timings) * 1000,
+    'max_ms': max(timings) * 1000,
+  }
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='1000,10000,100000')
+  parser.add_argument('--runs', type=int, default=5)
+  args = parser.parse_args()
+  print('%10s %8s %12s %12s' % ('venues', 'queries', 'median ms', 'max ms'))
+  for size in [int(s) for s in args.sizes.split(',')]:
+    result = run(size, args.runs)
+    print('%(venues)10d %(queries)8d %(median_ms)12.1f %(max_ms)12.1f' % result)
+  os.remove(DB_FILE)
@@ -0,0 +1,106 @@
+"""Query plan check for the pages that read the Show table.
+
+Seeds a database, requests the venue and artist detail pages and the show
+listing through the Flask test client, captures every statement they send
+and runs EXPLAIN on each one that reads "Show". Fails (exit code 1) when
+any of them scans the Show table instead of using one of its indexes.
+
+Usage:
+    python benchmarks/check_plans.py [--database-url postgresql://...] [--shows 100000]
+
+Without --database-url a throw-away SQLite database is used. The tables of
+the given database are dropped and recreated, so never point it at real data.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def seed(db, num_shows):
+    from models import Venue, Artist, Show
+    db.drop_all()
+    db.create_all()
+    rnd = random.Random(num_shows)
+    num_entities = max(10, num_shows // 50)
+    now = datetime.now()
+    for model in (Venue, Artist):
+        db.session.execute(model.__table__.insert(), [
+            {'id': i, 'name': '%s %d' % (model.__name__, i), 'city': 'City %d' % (i % 100), 'state': 'CA'}
+            for i in range(1, num_entities + 1)
+        ])
+    db.session.execute(Show.__table__.insert(), [
+        {'venue_id': rnd.randint(1, num_entities), 'artist_id': rnd.randint(1, num_entities),
+         'time': now + timedelta(hours=rnd.randint(-24 * 365, 24 * 365))}
+        for _ in range(num_shows)
+    ])
+    db.session.commit()
+    # fresh statistics, so the planner knows how selective the indexes are
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('ANALYZE')
+        connection.commit()
+
+
+def capture(app, db, urls):
+    from sqlalchemy import event
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and re.search(r'\bFROM\s+"?Show"?|\bJOIN\s+"?Show"?', statement):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client = app.test_client()
+        for url in urls:
+            before = len(statements)
+            assert client.get(url).status_code == 200, url
+            yield url, statements[before:]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(db, statement, parameters):
+    postgresql = db.engine.dialect.name == 'postgresql'
+    prefix = 'EXPLAIN ' if postgresql else 'EXPLAIN QUERY PLAN '
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + statement, parameters).all()
+    plan = '\n'.join(str(row[0] if postgresql else row[-1]) for row in rows)
+    if postgresql:
+        scans_show = re.search(r'Seq Scan on "Show"', plan)
+    else:
+        scans_show = re.search(r'SCAN (?:"?Show"?)(?! USING)', plan)
+    return plan, not scans_show
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--shows', type=int, default=100000)
+    args = parser.parse_args()
+
+    import config
+    config.SQLALCHEMY_DATABASE_URI = args.database_url or \
+        'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='fyyur-plans-'), 'plans.db')
+    from app import app
+    from models import db
+
+    failed = False
+    with app.app_context():
+        seed(db, args.shows)
+        urls = ['/venues/1', '/artists/1', '/shows']
+        for url, statements in capture(app, db, urls):
+            for statement, parameters in statements:
+                plan, uses_index = explain(db, statement, parameters)
+                print('%s %s\n%s\n' % ('ok  ' if uses_index else 'FAIL', url, plan))
+                failed = failed or not uses_index
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
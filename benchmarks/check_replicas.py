@@ -0,0 +1,96 @@
+"""Read-replica routing check.
+
+Creates two throw-away SQLite files, a primary and a replica that is a copy
+of it, and drives the app through the Flask test client:
+
+- GETs of the read-only pages run their statements on the replica,
+- the POST of a venue edit runs on the primary and sets the pin cookie,
+- the GETs of the pinned client run on the primary and show the edit,
+  even after an unpinned client has put the lagging replica's page into
+  the page cache.
+
+The replica is never written to, so it stands for one that lags behind.
+Fails (exit code 1) when any of these does not hold.
+
+Usage:
+    python benchmarks/check_replicas.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def venue_form(name):
+  return {
+    'name': name,
+    'city': 'Springfield',
+    'state': 'IL',
+    'address': '1 Main St',
+    'phone': '555-555-5555',
+    'image_link': 'https://picsum.photos/300',
+    'genres': ['Jazz'],
+    'facebook_link': 'https://www.facebook.com/check',
+    'website': 'https://check.example.com',
+    'seeking_description': '',
+  }
+
+
+if __name__ == '__main__':
+  directory = tempfile.mkdtemp(prefix='fyyur-replicas-')
+  primary = os.path.join(directory, 'primary.db')
+  replica = os.path.join(directory, 'replica.db')
+  os.environ['DATABASE_URL'] = 'sqlite:///' + primary
+  os.environ['DATABASE_REPLICA_URLS'] = 'sqlite:///' + replica
+
+  from sqlalchemy import event
+  from app import app
+  from models import db, Venue
+  from replicas import PIN_COOKIE
+
+  with app.app_context():
+    db.create_all()
+    db.session.add(Venue(id=1, name='Original Hall', city='Springfield', state='IL'))
+    db.session.commit()
+    db.engine.dispose()
+  shutil.copyfile(primary, replica)
+
+  used = []
+  with app.app_context():
+    for key, engine in db.engines.items():
+      event.listen(engine, 'before_cursor_execute',
+                   lambda *args, name=key or 'primary': used.append(name))
+
+  failures = []
+
+  def check(description, response, database, text=None):
+    databases = set(used)
+    del used[:]
+    ok = response.status_code in (200, 302) and databases == {database}
+    if text is not None:
+      ok = ok and text.encode('utf-8') in response.data
+    print('%-4s %-46s %s' % ('ok' if ok else 'FAIL', description, ', '.join(sorted(databases))))
+    if not ok:
+      failures.append(description)
+
+  writer, other = app.test_client(), app.test_client()
+  check('GET /venues/1 reads the replica', writer.get('/venues/1'), 'replica_0', 'Original Hall')
+  check('GET /venues reads the replica', writer.get('/venues'), 'replica_0')
+  check('GET /api/v1/venues/1 reads the replica', writer.get('/api/v1/venues/1'), 'replica_0')
+
+  response = writer.post('/venues/1/edit', data=venue_form('Renamed Hall'))
+  check('POST /venues/1/edit writes the primary', response, 'primary')
+  pinned = writer.get_cookie(PIN_COOKIE) is not None
+  print('%-4s %s' % ('ok' if pinned else 'FAIL', 'the write sets the %s cookie' % PIN_COOKIE))
+  if not pinned:
+    failures.append('pin cookie')
+
+  # the first page after the edit carries its flash message and is never cached
+  check('GET /venues/1 of the writer reads the primary', writer.get('/venues/1'), 'primary', 'Renamed Hall')
+  check('GET /venues/1 of another client reads the replica', other.get('/venues/1'), 'replica_0', 'Original Hall')
+  check('GET /venues/1 of the writer again skips its page', writer.get('/venues/1'), 'primary', 'Renamed Hall')
+
+  shutil.rmtree(directory, ignore_errors=True)
+  sys.exit(1 if failures else 0)
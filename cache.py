@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, g, session
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+#----------------------------------------------------------------------------#
+# Rendered page cache for the venue and artist detail pages.
+#
+# Pages are stored under the entity id plus the ETag that @conditional
+# computed for the request from the row (conditional.py). A write from any
+# process, `flask import` and `flask seed` included, changes the row's
+# updated_at and so the key, which makes every older entry unreachable;
+# entries also expire by themselves when their first upcoming show starts
+# (it then becomes a past show). The store is pluggable: an in-process LRU
+# by default, or Redis so that all workers share pages.
+#----------------------------------------------------------------------------#
+
+class MemoryBackend:
+    """In-process LRU bounded by the total size of the cached pages."""
+
+    def __init__(self, max_size=32 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._delete(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self.lock:
+            self._delete(key)
+            self.entries[key] = (value, time.time() + timeout if timeout is not None else None)
+            self.size += len(value)
+            while self.size > self.max_size and self.entries:
+                self._delete(next(iter(self.entries)))
+
+    def _delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class RedisBackend:
+    """Pages in Redis, shared by all workers.
+
+    Eviction is left to Redis (configure maxmemory with an LRU policy).
+    """
+
+    def __init__(self, url, prefix='fyyur:'):
+        if redis is None:
+            raise RuntimeError('PAGE_CACHE_BACKEND = "redis" needs the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, value.encode('utf-8'),
+                        px=int(timeout * 1000) if timeout is not None else None)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class PageCache:
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self.timeout = 300
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.timeout = app.config.get('PAGE_CACHE_TIMEOUT', 300)
+        if self.backend is None:
+            if app.config.get('PAGE_CACHE_BACKEND', 'memory') == 'redis':
+                self.backend = RedisBackend(app.config['PAGE_CACHE_REDIS_URL'])
+            else:
+                self.backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_SIZE', 32 * 1024 * 1024))
+
+    def key(self, kind, id):
+        """Cache key of a page, None when the page must not be cached.
+
+        Pages are rendered with the pending flash messages of the visitor,
+        so those requests neither read nor fill the cache, and neither do
+        requests without the validator of the page (g.page_etag, set by
+        @conditional).
+        """
+        etag = g.get('page_etag')
+        if not self.enabled or etag is None or session.get('_flashes'):
+            return None
+        return 'page:%s:%s:%s' % (kind, id, etag)
+
+    def get(self, key):
+        # a client pinned to the primary after a write could otherwise get a
+        # page another client rendered from a lagging replica (replicas.py)
+        if key is None or g.get('db_pinned'):
+            return None
+        return self.backend.get(key)
+
+    def set(self, key, value, expires_at=None):
+        """Store a page until expires_at (a datetime) or the default timeout."""
+        if key is None:
+            return
+        timeout = self.timeout
+        if expires_at is not None:
+            timeout = min(timeout, max(0, (expires_at - datetime.now()).total_seconds()))
+        if g.get('db_replica') is not None:
+            # rendered from a replica, which may still lag the write that
+            # invalidated the page (see replicas.py)
+            timeout = min(timeout, current_app.config.get('REPLICA_PIN_SECONDS', 10))
+        if timeout > 0:
+            self.backend.set(key, value, timeout)
+
+    def clear(self):
+        self.backend.clear()
+
+
+page_cache = PageCache()
+
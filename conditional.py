@@ -0,0 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, request, session, make_response
+from sqlalchemy import func, select
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Conditional GET (ETag / Last-Modified) for entity pages.
+#
+# A view decorated with @conditional(validator) first runs the validator:
+# the updated_at of the venue or artist row (max(updated_at) for the
+# listings) plus the time of the latest show that has already started (the
+# past/upcoming boundary). When the client already
+# has that version the view is skipped and 304 Not Modified is returned.
+#----------------------------------------------------------------------------#
+
+def apply_cache_control(response):
+    """Cache-Control of the endpoint as configured in CACHE_CONTROL."""
+    policy = current_app.config.get('CACHE_CONTROL', {}).get(request.endpoint)
+    if policy and 'Cache-Control' not in response.headers and response.status_code in (200, 304):
+        response.headers['Cache-Control'] = policy
+    return response
+
+
+def conditional(validator):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flash messages are one-offs
+            if session.get('_flashes'):
+                response = make_response(current_app.ensure_sync(view)(**kwargs))
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            validated = validator(**kwargs)
+            if validated is None:
+                return current_app.ensure_sync(view)(**kwargs)
+            parts, last_modified = validated
+            etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+            # the page cache keys the page on it too (cache.py)
+            g.page_etag = etag
+            last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc) if last_modified else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since)
+            response = current_app.response_class(status=304) if not_modified else make_response(current_app.ensure_sync(view)(**kwargs))
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _as_utc(local_time):
+    # show times are naive local times, updated_at values naive UTC
+    if local_time is None:
+        return None
+    return local_time.astimezone(timezone.utc).replace(tzinfo=None)
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+def _entity_validator(model, show_owner, id):
+    # the row's updated_at covers its own edits, its shows (counters.py
+    # bumps it with the counters) and edits of the other side of its shows
+    # (counters.touch_counterparts). The latest show that has started moves
+    # a show from upcoming to past on the page, an index lookup on
+    # (venue_id|artist_id, time).
+    boundary = select(func.max(Show.time)).where(show_owner == model.id, Show.time <= datetime.now()
+      ).scalar_subquery()
+    row = db.session.query(model.updated_at, boundary).filter(model.id == id).first()
+    if row is None:
+        return None
+    return tuple(row), _latest(row[0], _as_utc(row[1]))
+
+
+def venue_validator(venue_id):
+    return _entity_validator(Venue, Show.venue_id, venue_id)
+
+
+def artist_validator(artist_id):
+    return _entity_validator(Artist, Show.artist_id, artist_id)
+
+
+def venues_validator():
+    venues = db.session.query(func.max(Venue.updated_at), func.count(Venue.id)).one()
+    shows = db.session.query(func.max(Show.updated_at)).scalar()
+    boundary = db.session.query(func.max(Show.time)).filter(Show.time <= datetime.now()).scalar()
+    return (tuple(venues), shows, boundary), _latest(venues[0], shows, _as_utc(boundary))
+
+
+def artists_validator():
+    artists = db.session.query(func.max(Artist.updated_at), func.count(Artist.id)).one()
+    return tuple(artists), artists[0]
+
+
+def shows_validator():
+    # shows are never deleted on their own, so no count is needed here
+    shows = db.session.query(func.max(Show.updated_at)).scalar()
+    venues = db.session.query(func.max(Venue.updated_at)).scalar()
+    artists = db.session.query(func.max(Artist.updated_at)).scalar()
+    return (shows, venues, artists), _latest(shows, venues, artists)
@@ -0,0 +1,152 @@
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, case, select
+from models import db, Venue, Artist, Show, ShowCounterState, utcnow
+
+#----------------------------------------------------------------------------#
+# Upcoming/past show counters on Venue and Artist.
+#
+# A show counts as past once its time is at or before the watermark
+# ShowCounterState.rolled_until, not the wall clock. Writes adjust the
+# counters in their own transaction, and `flask counters roll-forward`
+# (run it from cron, e.g. every minute) moves the shows that started since
+# the last run from upcoming to past and advances the watermark. Writers
+# hold a shared lock on the watermark row and the roll-forward an exclusive
+# one, so no show is counted against a watermark that is being moved.
+#----------------------------------------------------------------------------#
+
+COUNTED = ((Venue.__table__, Show.venue_id), (Artist.__table__, Show.artist_id))
+
+
+def get_state(exclusive=False):
+    state = db.session.query(ShowCounterState).filter(ShowCounterState.id == 1
+      ).with_for_update(read=not exclusive).first()
+    if state is None:
+        # fresh database without the migration's row
+        state = ShowCounterState(id=1, rolled_until=datetime.now())
+        db.session.add(state)
+        db.session.flush()
+    return state
+
+
+def _adjust(table, deltas):
+    """Add (upcoming, past) deltas to the counters of many rows at once.
+
+    The upcoming deltas are also left in session.info for the autocomplete
+    indexes, which apply them once the transaction commits (suggest.py).
+    """
+    params = [{'row_id': id, 'upcoming': upcoming, 'past': past}
+              for id, (upcoming, past) in deltas.items() if upcoming or past]
+    pending = db.session.info.setdefault('upcoming_show_deltas', {})
+    for param in params:
+        key = (table.name.lower(), param['row_id'])
+        pending[key] = pending.get(key, 0) + param['upcoming']
+    if params:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('row_id')).values(
+                upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                past_shows_count=table.c.past_shows_count + bindparam('past')
+            ),
+            params
+        )
+
+
+def touch_counterparts(model, id):
+    """Bump updated_at of the artists playing at a venue, or the venues of an artist.
+
+    Their pages list the venue's (artist's) name and image, and their
+    conditional GET validators only look at their own row (conditional.py).
+    Counter changes bump updated_at through _adjust already.
+    """
+    if model is Venue:
+        table, column, owner = Artist.__table__, Show.artist_id, Show.venue_id
+    else:
+        table, column, owner = Venue.__table__, Show.venue_id, Show.artist_id
+    db.session.execute(table.update().where(table.c.id.in_(select(column).where(owner == id)))
+                       .values(updated_at=utcnow()))
+
+
+def count_new_show(venue_id, artist_id, time):
+    count_new_shows([(venue_id, artist_id, time)])
+
+
+def count_new_shows(shows):
+    """Add (venue_id, artist_id, time) shows to the counters, one update per table."""
+    rolled_until = get_state().rolled_until
+    venues, artists = {}, {}
+    for venue_id, artist_id, time in shows:
+        if time is None:
+            continue
+        upcoming = 1 if time > rolled_until else 0
+        for deltas, id in ((venues, venue_id), (artists, artist_id)):
+            delta = deltas.get(id, (0, 0))
+            deltas[id] = (delta[0] + upcoming, delta[1] + 1 - upcoming)
+    _adjust(Venue.__table__, venues)
+    _adjust(Artist.__table__, artists)
+
+
+def delete_shows(*criteria):
+    """Delete the shows matching criteria and take them off the counters."""
+    rolled_until = get_state().rolled_until
+    num_upcoming = func.sum(case((Show.time > rolled_until, 1), else_=0))
+    num_past = func.sum(case((Show.time <= rolled_until, 1), else_=0))
+    for table, column in COUNTED:
+        rows = db.session.query(column, num_upcoming, num_past).filter(*criteria).group_by(column)
+        _adjust(table, {id: (-upcoming, -past) for id, upcoming, past in rows})
+    db.session.query(Show).filter(*criteria).delete(synchronize_session=False)
+
+
+def roll_forward(now=None):
+    """Move shows that started since the last run to past. Returns their number."""
+    now = now or datetime.now()
+    state = get_state(exclusive=True)
+    if now <= state.rolled_until:
+        return 0
+    started = (Show.time > state.rolled_until, Show.time <= now)
+    moved = 0
+    for table, column in COUNTED:
+        rows = db.session.query(column, func.count(Show.id)).filter(*started).group_by(column).all()
+        _adjust(table, {id: (-count, count) for id, count in rows})
+        # the same shows for both tables
+        moved = sum(count for id, count in rows)
+    state.rolled_until = now
+    return moved
+
+
+def recount(now=None):
+    """Recompute every counter from the Show table."""
+    state = get_state(exclusive=True)
+    state.rolled_until = now or datetime.now()
+    for table, column in COUNTED:
+        shows = select(func.count(Show.id)).where(column == table.c.id).scalar_subquery()
+        db.session.execute(table.update().values(
+            upcoming_shows_count=shows.where(Show.time > state.rolled_until),
+            past_shows_count=shows.where(Show.time <= state.rolled_until)
+        ))
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.group('counters', help='Maintain the upcoming/past show counters.')
+def counters_cli():
+    pass
+
+
+@counters_cli.command('roll-forward')
+@with_appcontext
+def roll_forward_command():
+    """Move shows that have started from upcoming to past."""
+    moved = roll_forward()
+    db.session.commit()
+    click.echo('%d shows moved to past' % moved)
+
+
+@counters_cli.command('recount')
+@with_appcontext
+def recount_command():
+    """Recompute all counters, e.g. after loading shows directly into the database."""
+    recount()
+    db.session.commit()
+    click.echo('counters recomputed')
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import sys
+import zlib
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from models import db, Venue, Artist, Show, venue_genre_table, artist_genre_table
+from genres import genre_names
+
+#----------------------------------------------------------------------------#
+# Streaming export of venues, artists and shows as NDJSON or CSV.
+#
+# Rows are read through a server-side cursor (yield_per) in id order, a
+# partition at a time, and the genres of a partition are fetched with one
+# extra query. Output is produced chunk by chunk and optionally gzipped on
+# the fly, so memory use does not grow with the table. The CSV layout is
+# the one `flask import` reads (genres separated by '|').
+#----------------------------------------------------------------------------#
+
+PARTITION_SIZE = 1000
+
+EXPORTS = {
+    'venue': (Venue, venue_genre_table, 'venue_id'),
+    'artist': (Artist, artist_genre_table, 'artist_id'),
+    'show': (Show, None, None),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_fields(entity):
+    if entity == 'show':
+        return ['id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'start_time', 'updated_at']
+    return [column.key for column in EXPORTS[entity][0].__table__.columns] + ['genres']
+
+
+def _statement(entity):
+    if entity == 'show':
+        return select(
+            Show.id,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Show.time.label('start_time'),
+            Show.updated_at
+          ).join(Venue, Show.venue_id == Venue.id
+          ).join(Artist, Show.artist_id == Artist.id
+          ).order_by(Show.id)
+    model = EXPORTS[entity][0]
+    return select(model.__table__).order_by(model.__table__.c.id)
+
+
+def export_rows(entity):
+    """Yield the rows of entity as dicts, holding one partition at a time."""
+    model, link_table, owner_column = EXPORTS[entity]
+    result = db.session.execute(_statement(entity), execution_options={'yield_per': PARTITION_SIZE})
+    for partition in result.partitions():
+        if link_table is not None:
+            genres = genre_names(link_table, owner_column, [row.id for row in partition])
+        for row in partition:
+            row = row._asdict()
+            if link_table is not None:
+                row['genres'] = genres.get(row['id'], [])
+            yield row
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return '|'.join(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ')
+    return str(value)
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ')
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def export_chunks(entity, format, rows_per_chunk=PARTITION_SIZE):
+    """Yield the export as text chunks of rows_per_chunk rows each."""
+    fields = export_fields(entity)
+    buffer = io.StringIO()
+    writer = None
+    if format == 'csv':
+        writer = csv.DictWriter(buffer, fields, lineterminator='\n')
+        writer.writeheader()
+    count = 0
+    for row in export_rows(entity):
+        if writer is not None:
+            writer.writerow({field: _text(row[field]) for field in fields})
+        else:
+            buffer.write(json.dumps(row, default=_json_default) + '\n')
+        count += 1
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    """Gzip a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', type=click.Choice(sorted(FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='File to write, standard output by default.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@with_appcontext
+def export_command(entity, format, output, compress):
+    """Export all venues, artists or shows as NDJSON or CSV."""
+    chunks = export_chunks(entity, format)
+    if compress:
+        chunks = gzipped(chunks)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+    file = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            file.write(chunk)
+    finally:
+        if output:
+            file.close()
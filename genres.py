@@ -0,0 +1,116 @@
+import threading
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Genre
+import enums
+
+#----------------------------------------------------------------------------#
+# Genre resolution for venue and artist writes.
+#
+# Genre names are mapped to ids through a process-wide cache that is seeded
+# with every enums.Genre on first use. Unknown names are created with a
+# single INSERT ... ON CONFLICT DO NOTHING (Genre.name is unique), and the
+# links of a venue or artist are written with one bulk insert (edits only
+# write the difference to the stored links).
+#----------------------------------------------------------------------------#
+
+_genre_ids = {}
+_lock = threading.Lock()
+
+
+def insert(table):
+    """An INSERT that supports ON CONFLICT on the current database."""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def resolve_genre_ids(names):
+    """Return the ids of the genre names, creating the missing genres.
+
+    Genres created here belong to the current transaction, so they only
+    enter the cache once it commits.
+    """
+    names = list(dict.fromkeys(names))
+    pending = db.session.info.setdefault('new_genre_ids', {})
+    missing = [name for name in names if name not in _genre_ids and name not in pending]
+    if missing:
+        if not _genre_ids:
+            missing += [genre.name for genre in enums.Genre if genre.name not in missing]
+        inserted = db.session.execute(
+            insert(Genre.__table__).values([{'name': name} for name in missing]
+            ).on_conflict_do_nothing(index_elements=['name']
+            ).returning(Genre.__table__.c.id, Genre.__table__.c.name)
+        ).all()
+        pending.update({name: id for id, name in inserted})
+        existing = [name for name in missing if name not in pending]
+        if existing:
+            rows = db.session.execute(
+                select(Genre.__table__.c.name, Genre.__table__.c.id).where(Genre.__table__.c.name.in_(existing))
+            ).all()
+            with _lock:
+                _genre_ids.update(rows)
+    return [_genre_ids.get(name) or pending[name] for name in names]
+
+
+def add_genres(table, owner_column, owner_id, genre_ids):
+    """Link genre_ids to one venue or artist with a single bulk insert."""
+    if genre_ids:
+        db.session.execute(
+            insert(table).on_conflict_do_nothing(),
+            [{owner_column: owner_id, 'genre_id': genre_id} for genre_id in genre_ids]
+        )
+
+
+def replace_genres(table, owner_column, owner_id, genre_ids):
+    """Make genre_ids the genres of one venue or artist.
+
+    Only the difference to the stored links is written: one bulk delete of
+    the deselected genres and one bulk insert of the new ones.
+    """
+    owner = table.c[owner_column]
+    current = set(db.session.execute(
+        select(table.c.genre_id).where(owner == owner_id)
+    ).scalars())
+    removed = current - set(genre_ids)
+    if removed:
+        db.session.execute(
+            table.delete().where(owner == owner_id, table.c.genre_id.in_(removed))
+        )
+    add_genres(table, owner_column, owner_id,
+               [genre_id for genre_id in genre_ids if genre_id not in current])
+
+
+def genre_names(table, owner_column, owner_ids):
+    """Genre names of many venues or artists in one query, {owner id: [names]}."""
+    owner = table.c[owner_column]
+    names = {}
+    if owner_ids:
+        rows = db.session.execute(
+            select(owner, Genre.name).join(Genre, Genre.id == table.c.genre_id
+              ).where(owner.in_(owner_ids)
+              ).order_by(owner, Genre.name)
+        )
+        for owner_id, name in rows:
+            names.setdefault(owner_id, []).append(name)
+    return names
+
+
+def reset_genre_cache():
+    with _lock:
+        _genre_ids.clear()
+
+
+def _cache_new_genres(session):
+    new_genre_ids = session.info.pop('new_genre_ids', None)
+    if new_genre_ids:
+        with _lock:
+            _genre_ids.update(new_genre_ids)
+
+
+def _discard_new_genres(session, *args):
+    session.info.pop('new_genre_ids', None)
+
+
+event.listen(db.session, 'after_commit', _cache_new_genres)
+event.listen(db.session, 'after_soft_rollback', _discard_new_genres)
@@ -0,0 +1,205 @@
+import csv
+import itertools
+import json
+import os
+import time
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+from models import db, Venue, Artist, Show, ImportCheckpoint, venue_genre_table, artist_genre_table
+from forms import VenueForm, ArtistForm, ShowForm
+from genres import insert, resolve_genre_ids
+from counters import count_new_shows
+
+#----------------------------------------------------------------------------#
+# Streaming bulk import of venues, artists and shows.
+#
+# Rows are read lazily from CSV or NDJSON, validated with the same forms as
+# the web handlers and written in batches: one multi-row INSERT per table
+# and batch, genres and foreign keys resolved once per batch. Every batch
+# commits together with its checkpoint, so an interrupted import resumes
+# after the last committed batch when run again.
+#----------------------------------------------------------------------------#
+
+ENTITIES = {
+    'venue': (VenueForm, Venue, venue_genre_table, 'venue_id'),
+    'artist': (ArtistForm, Artist, artist_genre_table, 'artist_id'),
+    'show': (ShowForm, Show, None, None),
+}
+
+
+class UnreadableLine:
+    """An NDJSON line that is not a JSON object, rejected like an invalid row."""
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+
+def read_rows(path, format):
+    """Yield the rows of a CSV (genres separated by '|') or NDJSON file.
+
+    Malformed NDJSON lines are yielded as UnreadableLine, so they count as
+    rows for the checkpoint and end up in the rejects file.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            for row in csv.DictReader(file):
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split('|') if genre.strip()]
+                yield row
+        else:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield UnreadableLine(line.rstrip('\n'), 'Invalid JSON: %s' % error)
+                    continue
+                if isinstance(row, dict):
+                    yield row
+                else:
+                    yield UnreadableLine(line.rstrip('\n'), 'Not a JSON object.')
+
+
+def validate(form_class, row):
+    """Return (data, None) for a valid row or (None, errors)."""
+    formdata = MultiDict()
+    for field, value in row.items():
+        for value in (value if isinstance(value, list) else [value]):
+            if isinstance(value, bool):
+                value = 'y' if value else ''
+            formdata.add(field, '' if value is None else str(value))
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return form.data, None
+
+
+def write_entities(model, link_table, owner_column, batch):
+    """Insert (row number, data) pairs with their genre links, returns (rejected, ids)."""
+    batch = [data for number, data in batch]
+    columns = [column.key for column in model.__table__.columns
+               if column.key not in ('id', 'genres', 'updated_at', 'upcoming_shows_count', 'past_shows_count')]
+    values = [{column: data.get(column) for column in columns} for data in batch]
+    ids = db.session.execute(
+        model.__table__.insert().returning(model.__table__.c.id, sort_by_parameter_order=True),
+        values
+    ).scalars().all()
+
+    names = sorted({genre for data in batch for genre in data['genres']})
+    genre_ids = dict(zip(names, resolve_genre_ids(names)))
+    links = [{owner_column: id, 'genre_id': genre_ids[genre]}
+             for id, data in zip(ids, batch) for genre in set(data['genres'])]
+    if links:
+        db.session.execute(insert(link_table).on_conflict_do_nothing(), links)
+    return [], ids
+
+
+def _id_error(value, name):
+    """(id, None) for a numeric id, (None, reason) for a missing or malformed one."""
+    value = str(value or '').strip()
+    if not value:
+        return None, 'Missing %s id.' % name
+    if not value.isdigit():
+        return None, 'Invalid %s id.' % name
+    return int(value), None
+
+
+def write_shows(batch):
+    """Insert the shows whose venue and artist exist, returns (rejected, shows)."""
+    parsed = [(number, data, _id_error(data.get('venue_id'), 'venue'), _id_error(data.get('artist_id'), 'artist'))
+              for number, data in batch]
+    venue_ids = {venue[0] for number, data, venue, artist in parsed if venue[0] is not None}
+    artist_ids = {artist[0] for number, data, venue, artist in parsed if artist[0] is not None}
+    venue_ids = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))} if venue_ids else set()
+    artist_ids = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))} if artist_ids else set()
+
+    shows, rejected = [], []
+    for number, data, (venue_id, venue_error), (artist_id, artist_error) in parsed:
+        errors = {}
+        if venue_error or venue_id not in venue_ids:
+            errors['venue_id'] = [venue_error or 'Unknown venue.']
+        if artist_error or artist_id not in artist_ids:
+            errors['artist_id'] = [artist_error or 'Unknown artist.']
+        if errors:
+            rejected.append({'row': number, 'errors': errors,
+                             'data': {key: '' if value is None else str(value) for key, value in data.items()}})
+        else:
+            shows.append({'venue_id': venue_id, 'artist_id': artist_id, 'time': data['start_time']})
+    if shows:
+        db.session.execute(Show.__table__.insert(), shows)
+        count_new_shows([(show['venue_id'], show['artist_id'], show['time']) for show in shows])
+    return rejected, shows
+
+
+def run_import(entity, path, format, batch_size=1000, restart=False, echo=click.echo):
+    form_class, model, link_table, owner_column = ENTITIES[entity]
+    source = '%s:%s' % (entity, os.path.abspath(path))
+    checkpoint = db.session.get(ImportCheckpoint, source)
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(source=source, rows_done=0)
+        db.session.add(checkpoint)
+    elif restart:
+        checkpoint.rows_done = 0
+    skipped = checkpoint.rows_done
+    if skipped:
+        echo('resuming after %d rows' % skipped)
+
+    rows = itertools.islice(read_rows(path, format), skipped, None)
+    imported = rejected = 0
+    started = time.perf_counter()
+    with open(path + '.rejects.ndjson', 'a', encoding='utf-8') as rejects:
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            batch, errors = [], []
+            for number, row in enumerate(chunk, start=checkpoint.rows_done + 1):
+                if isinstance(row, UnreadableLine):
+                    errors.append({'row': number, 'errors': {'line': [row.error]}, 'data': row.line})
+                    continue
+                data, row_errors = validate(form_class, row)
+                if data is None:
+                    errors.append({'row': number, 'errors': row_errors, 'data': row})
+                else:
+                    batch.append((number, data))
+            written = []
+            if batch:
+                if entity == 'show':
+                    missing, written = write_shows(batch)
+                else:
+                    missing, written = write_entities(model, link_table, owner_column, batch)
+                errors += missing
+            checkpoint.rows_done += len(chunk)
+            db.session.commit()
+
+            for error in errors:
+                rejects.write(json.dumps(error) + '\n')
+            imported += len(written)
+            rejected += len(errors)
+            elapsed = time.perf_counter() - started
+            echo('%d rows imported, %d rejected (%.0f rows/s)'
+                 % (imported, rejected, (imported + rejected) / elapsed if elapsed else 0))
+
+    elapsed = time.perf_counter() - started
+    echo('done: %d imported, %d rejected in %.1fs (%.0f rows/s)'
+         % (imported, rejected, elapsed, (imported + rejected) / elapsed if elapsed else 0))
+    if rejected:
+        echo('rejected rows are listed in %s' % (path + '.rejects.ndjson'))
+    return imported, rejected
+
+
+@click.command('import')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']),
+              help='File format, by default taken from the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an earlier run.')
+@with_appcontext
+def import_command(entity, path, format, batch_size, restart):
+    """Import venues, artists or shows from a CSV or NDJSON file."""
+    format = format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    run_import(entity, path, format, batch_size, restart)
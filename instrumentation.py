@@ -0,0 +1,86 @@
+import time
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#
+# Cursor events on every engine count the statements of the current request
+# and add up their time. Responses carry the totals as X-DB-Queries,
+# X-DB-Time (milliseconds) and Server-Timing, and requests over the
+# configured thresholds are logged. The work per statement is two clock
+# reads and an addition, so it can stay on in production.
+#----------------------------------------------------------------------------#
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = g.get('request_stats') if has_app_context() else None
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(exception_context):
+    # the statement failed, after_cursor_execute will not pop its start
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+class SQLInstrumentation:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    @staticmethod
+    def start():
+        g.request_stats = RequestStats()
+
+    @staticmethod
+    def finish(response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.db_time * 1000
+        response.headers['X-DB-Queries'] = str(stats.queries)
+        response.headers['X-DB-Time'] = '%.1f' % db_ms
+        # streamed bodies (exports) are still running, their time is not in here
+        response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (db_ms, stats.queries))
+        response.headers.add('Server-Timing', 'app;dur=%.1f' % total_ms)
+
+        config = current_app.config
+        if (stats.queries > config.get('SLOW_REQUEST_QUERIES', 20)
+                or db_ms > config.get('SLOW_REQUEST_DB_MS', 200)
+                or total_ms > config.get('SLOW_REQUEST_MS', 500)):
+            current_app.logger.warning('slow request %s %s: %d queries, %.1fms in the database, %.1fms total',
+                                       request.method, request.full_path.rstrip('?'), stats.queries, db_ms, total_ms)
+        return response
+
+
+sql_instrumentation = SQLInstrumentation()
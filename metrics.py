@@ -0,0 +1,117 @@
+import os
+import time
+from flask import current_app, g, request, has_request_context, template_rendered, before_render_template
+from sqlalchemy.pool import QueuePool
+from models import db
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+#----------------------------------------------------------------------------#
+# Prometheus metrics at /metrics.
+#
+# Per Flask endpoint it records request latency, response size and template
+# render time, plus the connection pool of the database. Each metric is
+# updated when a request finishes.
+#
+# With several worker processes (gunicorn), set PROMETHEUS_MULTIPROC_DIR to
+# an empty directory before the workers start. Every process then writes
+# its samples to memory-mapped files there, and /metrics adds them up. The
+# directory must be emptied when the server restarts, and the gunicorn
+# config should call metrics.child_exit from its child_exit hook.
+#----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Metrics:
+
+    def __init__(self, app=None):
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        if prometheus_client is None:
+            app.logger.warning('METRICS_ENABLED is set but prometheus_client is not installed, '
+                               'no metrics are recorded')
+            return
+        self.enabled = True
+        self.request_latency = prometheus_client.Histogram(
+            'fyyur_request_duration_seconds', 'Time to handle a request.',
+            ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+        self.requests = prometheus_client.Counter(
+            'fyyur_requests', 'Handled requests.', ['endpoint', 'method', 'status'])
+        self.response_size = prometheus_client.Histogram(
+            'fyyur_response_size_bytes', 'Size of response bodies.',
+            ['endpoint'], buckets=SIZE_BUCKETS)
+        self.render_time = prometheus_client.Histogram(
+            'fyyur_template_render_seconds', 'Time to render a template.',
+            ['endpoint', 'template'], buckets=LATENCY_BUCKETS)
+        # pool gauges are summed over the live worker processes
+        self.pool_size = prometheus_client.Gauge(
+            'fyyur_db_pool_size', 'Connections the pool keeps open.', multiprocess_mode='livesum')
+        self.pool_checked_out = prometheus_client.Gauge(
+            'fyyur_db_pool_checked_out', 'Connections in use.', multiprocess_mode='livesum')
+        self.pool_overflow = prometheus_client.Gauge(
+            'fyyur_db_pool_overflow', 'Connections opened beyond the pool size.', multiprocess_mode='livesum')
+
+        app.before_request(self.start)
+        app.after_request(self.finish)
+        before_render_template.connect(self.start_render, app)
+        template_rendered.connect(self.finish_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def start(self):
+        g.metrics_started = time.perf_counter()
+
+    def finish(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        # unmatched urls share one label instead of one series per path
+        endpoint = request.endpoint or 'unmatched'
+        self.request_latency.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        self.requests.labels(endpoint, request.method, str(response.status_code)).inc()
+        if response.content_length is not None:
+            self.response_size.labels(endpoint).observe(response.content_length)
+        pool = db.engine.pool
+        if isinstance(pool, QueuePool):
+            self.pool_size.set(pool.size())
+            self.pool_checked_out.set(pool.checkedout())
+            self.pool_overflow.set(max(0, pool.overflow()))
+        return response
+
+    def start_render(self, sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault('render_started', []).append(time.perf_counter())
+
+    def finish_render(self, sender, template, context, **extra):
+        started = g.get('render_started') if has_request_context() else None
+        if started:
+            self.render_time.labels(request.endpoint or 'unmatched', template.name or 'string'
+                                    ).observe(time.perf_counter() - started.pop())
+
+    def view(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return current_app.response_class(prometheus_client.generate_latest(registry),
+                                          mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
+
+
+def child_exit(server, worker):
+    """gunicorn hook: drop the live gauges of a worker that exited."""
+    if prometheus_client is not None and 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -27,6 +27,15 @@ config.set_main_option(
     str(current_app.extensions['migrate'].db.engine.url).replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+# database-only search objects (see migration 9c1e5b7f3a21) that are not
+# declared on the models and must not be dropped by autogenerate
+SEARCH_OBJECTS = {'search_vector', 'ix_venue_search_vector', 'ix_venue_name_trgm',
+                  'ix_artist_search_vector', 'ix_artist_name_trgm'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name in SEARCH_OBJECTS)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -83,6 +92,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
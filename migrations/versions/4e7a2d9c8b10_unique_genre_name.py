@@ -0,0 +1,41 @@
+"""unique genre names
+
+Revision ID: 4e7a2d9c8b10
+Revises: 9c1e5b7f3a21
+Create Date: 2026-10-18 11:02:17.284519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7a2d9c8b10'
+down_revision = '9c1e5b7f3a21'
+branch_labels = None
+depends_on = None
+
+# the genre row that survives for every name
+KEEP = 'SELECT name, min(id) AS id FROM "Genre" GROUP BY name'
+DUPLICATES = 'SELECT g.id FROM "Genre" g JOIN ({}) keep ON keep.name = g.name WHERE g.id <> keep.id'.format(KEEP)
+
+
+def upgrade():
+    # point the links of duplicate genres at the surviving row, then drop the duplicates
+    for table, owner in (('venue_genre', 'venue_id'), ('artist_genre', 'artist_id')):
+        op.execute(
+            'INSERT INTO {table} (genre_id, {owner}) '
+            'SELECT DISTINCT keep.id, link.{owner} FROM {table} link '
+            'JOIN "Genre" g ON g.id = link.genre_id '
+            'JOIN ({keep}) keep ON keep.name = g.name '
+            'WHERE keep.id <> g.id '
+            'ON CONFLICT DO NOTHING'.format(table=table, owner=owner, keep=KEEP)
+        )
+        op.execute('DELETE FROM {table} WHERE genre_id IN ({duplicates})'.format(
+            table=table, duplicates=DUPLICATES))
+    op.execute('DELETE FROM "Genre" WHERE id IN (SELECT id FROM ({}) duplicate)'.format(DUPLICATES))
+    op.create_index(op.f('ix_Genre_name'), 'Genre', ['name'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Genre_name'), table_name='Genre')
@@ -0,0 +1,37 @@
+"""indexes on Show for the detail pages and the show listing
+
+Revision ID: 5b2c7e9d1f43
+Revises: d3f81a6c2e57
+Create Date: 2026-10-18 12:15:03.618240
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2c7e9d1f43'
+down_revision = 'd3f81a6c2e57'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Show_venue_id_time', ['venue_id', 'time']),
+    ('ix_Show_artist_id_time', ['artist_id', 'time']),
+    ('ix_Show_time_id', ['time', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY does not lock out writes to Show, but it
+    # cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'Show', columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.drop_index(name, table_name='Show', postgresql_concurrently=True, if_exists=True)
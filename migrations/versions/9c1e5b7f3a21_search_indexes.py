@@ -0,0 +1,47 @@
+"""full-text and trigram search indexes for venues and artists
+
+Revision ID: 9c1e5b7f3a21
+Revises: 1f39f34d358d
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e5b7f3a21'
+down_revision = '1f39f34d358d'
+branch_labels = None
+depends_on = None
+
+# name weighs more than the location in the ranking
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')"
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # other databases are searched through the in-process index
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'ALTER TABLE "{table}" ADD COLUMN search_vector tsvector '
+            'GENERATED ALWAYS AS ({vector}) STORED'.format(table=table, vector=SEARCH_VECTOR)
+        )
+        op.create_index('ix_{}_search_vector'.format(table.lower()), table, ['search_vector'],
+                        postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(table.lower()), table, ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_{}_name_trgm'.format(table.lower()), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table.lower()), table_name=table)
+        op.drop_column(table, 'search_vector')
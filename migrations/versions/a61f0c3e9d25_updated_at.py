@@ -0,0 +1,36 @@
+"""updated_at on venues, artists and shows
+
+Revision ID: a61f0c3e9d25
+Revises: 5b2c7e9d1f43
+Create Date: 2026-10-18 13:04:38.170662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61f0c3e9d25'
+down_revision = '5b2c7e9d1f43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows start out as modified now (naive UTC, like the model default)
+    if op.get_bind().dialect.name == 'postgresql':
+        now = sa.text("(now() at time zone 'utc')")
+    else:
+        now = sa.text('CURRENT_TIMESTAMP')
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', server_default=None)
+        # max(updated_at) is read on every conditional request
+        op.create_index(op.f('ix_{}_updated_at'.format(table)), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index(op.f('ix_{}_updated_at'.format(table)), table_name=table)
+        op.drop_column(table, 'updated_at')
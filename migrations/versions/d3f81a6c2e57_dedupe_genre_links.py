@@ -0,0 +1,37 @@
+"""deduplicate venue and artist genre links
+
+Revision ID: d3f81a6c2e57
+Revises: 4e7a2d9c8b10
+Create Date: 2026-10-18 11:40:52.911374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f81a6c2e57'
+down_revision = '4e7a2d9c8b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # edits used to re-append every submitted genre; keep one row per link
+    # (a no-op where the composite primary key already prevented repeats)
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, owner in (('venue_genre', 'venue_id'), ('artist_genre', 'artist_id')):
+        if postgresql:
+            op.execute(
+                'DELETE FROM {table} a USING {table} b WHERE a.ctid < b.ctid '
+                'AND a.genre_id = b.genre_id AND a.{owner} = b.{owner}'.format(table=table, owner=owner)
+            )
+        else:
+            op.execute(
+                'DELETE FROM {table} WHERE rowid NOT IN ('
+                'SELECT min(rowid) FROM {table} GROUP BY genre_id, {owner})'.format(table=table, owner=owner)
+            )
+
+
+def downgrade():
+    pass
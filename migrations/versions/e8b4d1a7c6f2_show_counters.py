@@ -0,0 +1,46 @@
+"""upcoming/past show counters on venues and artists
+
+Revision ID: e8b4d1a7c6f2
+Revises: a61f0c3e9d25
+Create Date: 2026-10-18 14:21:55.407931
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4d1a7c6f2'
+down_revision = 'a61f0c3e9d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    state = op.create_table('show_counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    rolled_until = datetime.now()
+    op.bulk_insert(state, [{'id': 1, 'rolled_until': rolled_until}])
+
+    for table, owner in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        # count the existing shows against the watermark stored above
+        op.execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{owner} = "{table}".id '
+            'AND "Show".time > :rolled_until), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{owner} = "{table}".id '
+            'AND "Show".time <= :rolled_until)'.format(table=table, owner=owner)
+        ).bindparams(rolled_until=rolled_until))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('show_counter_state')
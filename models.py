@@ -1,6 +1,13 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def utcnow():
+    # updated_at columns hold naive UTC timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -11,7 +18,7 @@ class Genre(db.Model):
     __tablename__ = 'Genre'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, unique=True, index=True)
     pass
 #Mapping table between Artist and Genre (Many to Many)
 artist_genre_table = db.Table('artist_genre',
@@ -59,6 +66,10 @@ class Venue(db.Model):
                             )
     seeking = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # maintained by counters.py, see there
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
     def __repr__(self):
       return f'<id: {self.id}, name: {self.name}>'
     pass
@@ -82,12 +93,22 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    # maintained by counters.py, see there
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
     def __repr__(self):
        return f'<id: {self.id}, name: {self.name}>'
     pass
 
 class Show(db.Model):
     __tablename__ ='Show'
+    # detail pages filter by venue/artist and time, listings page on (time, id)
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_time', 'venue_id', 'time'),
+        db.Index('ix_Show_artist_id_time', 'artist_id', 'time'),
+        db.Index('ix_Show_time_id', 'time', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     time= db.Column(db.DateTime())
     venue_id = db.Column (db.Integer,
@@ -100,4 +121,20 @@ class Show(db.Model):
                         nullable = False
                         )
     artist = db.relationship('Artist',backref=db.backref('shows'))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
     pass
+
+
+class ShowCounterState(db.Model):
+    # single row: shows up to rolled_until are counted as past shows
+    __tablename__ = 'show_counter_state'
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_until = db.Column(db.DateTime, nullable=False)
+
+
+class ImportCheckpoint(db.Model):
+    # progress of `flask import` per source file, committed with each batch
+    __tablename__ = 'import_checkpoint'
+    source = db.Column(db.String, primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
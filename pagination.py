@@ -0,0 +1,159 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import tuple_, func, text
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset (cursor based) pagination.
+#----------------------------------------------------------------------------#
+
+class Page:
+    """One page of rows plus the cursors of its neighbouring pages."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value
+              for value in values]
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns=None):
+    """Turn a cursor back into key values, None if it is missing or broken.
+
+    Values of DateTime columns are parsed back into datetimes.
+    """
+    if not cursor:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+        if not isinstance(values, list):
+            return None
+        if columns is None:
+            return values
+        if len(values) != len(columns):
+            return None
+        return [datetime.fromisoformat(value)
+                if column.type.python_type is datetime and value is not None
+                else value
+                for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def get_page_size(requested=None):
+    page_size = current_app.config.get('PAGE_SIZE', 20)
+    max_page_size = current_app.config.get('MAX_PAGE_SIZE', 100)
+    try:
+        page_size = int(requested) if requested else page_size
+    except ValueError:
+        pass
+    return max(1, min(page_size, max_page_size))
+
+
+def keyset_page(query, columns, after=None, before=None, page_size=None):
+    """Return a Page of query ordered by columns (the last one must be unique).
+
+    after/before are cursors as produced by this function. Rows of the query
+    must expose the key columns as attributes with the same names.
+    """
+    page_size = page_size or get_page_size()
+    after_key = decode_cursor(after, columns)
+    before_key = decode_cursor(before, columns) if after_key is None else None
+    key = lambda row: [getattr(row, column.key) for column in columns]
+
+    if before_key is not None:
+        # walk backwards from the cursor and flip the rows afterwards
+        rows = query.filter(tuple_(*columns) < tuple_(*before_key)
+                   ).order_by(*[column.desc() for column in columns]
+                   ).limit(page_size + 1).all()
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return Page(rows,
+                    next_cursor=encode_cursor(key(rows[-1])) if rows else None,
+                    prev_cursor=encode_cursor(key(rows[0])) if rows and has_prev else None)
+
+    if after_key is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after_key))
+    rows = query.order_by(*columns).limit(page_size + 1).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    return Page(rows,
+                next_cursor=encode_cursor(key(rows[-1])) if rows and has_next else None,
+                prev_cursor=encode_cursor(key(rows[0])) if rows and after_key is not None else None)
+
+class StreamedPage(Page):
+    """A page whose rows are read from a server-side cursor while it is iterated.
+
+    Meant for streamed templates: the rows are not held in memory, and
+    next_cursor/prev_cursor are only known once the rows have been iterated
+    (the pager comes after the rows).
+    """
+
+    def __init__(self, query, columns, after_key, page_size):
+        super().__init__([])
+        self.query = query
+        self.columns = columns
+        self.after_key = after_key
+        self.page_size = page_size
+        self.count = 0
+
+    def __iter__(self):
+        query = self.query
+        if self.after_key is not None:
+            query = query.filter(tuple_(*self.columns) > tuple_(*self.after_key))
+        rows = query.order_by(*self.columns).limit(self.page_size + 1
+                   ).execution_options(yield_per=min(self.page_size + 1, 100))
+        last = None
+        for row in rows:
+            if self.count == self.page_size:
+                self.next_cursor = encode_cursor([getattr(last, column.key) for column in self.columns])
+                break
+            if self.count == 0 and self.after_key is not None:
+                self.prev_cursor = encode_cursor([getattr(row, column.key) for column in self.columns])
+            self.count += 1
+            last = row
+            yield row
+
+    def __len__(self):
+        return self.count
+
+
+def keyset_stream(query, columns, after=None, before=None, page_size=None):
+    """Like keyset_page, but returns a StreamedPage when paging forward.
+
+    Backward pages are flipped after reading them, so they stay buffered.
+    """
+    page_size = page_size or get_page_size()
+    if before and decode_cursor(after, columns) is None:
+        return keyset_page(query, columns, before=before, page_size=page_size)
+    return StreamedPage(query, columns, decode_cursor(after, columns), page_size)
+
+#----------------------------------------------------------------------------#
+# Result counts.
+#----------------------------------------------------------------------------#
+
+def estimate_count(model):
+    """Row count of model's table, from the planner statistics when it is huge."""
+    if db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)'),
+            {'table': '"%s"' % model.__tablename__}
+        ).scalar()
+        if estimate and estimate > current_app.config.get('COUNT_ESTIMATE_THRESHOLD', 100000):
+            return estimate
+    return db.session.query(func.count()).select_from(model).scalar()
@@ -0,0 +1,150 @@
+import collections
+import hmac
+import os
+import threading
+import time
+from flask import current_app, request, jsonify, abort
+from sqlalchemy.pool import QueuePool, NullPool, AsyncAdaptedQueuePool
+from models import db
+
+#----------------------------------------------------------------------------#
+# Database connection pool.
+#
+# Pool size, overflow, timeout, recycle and pre-ping come from the DB_POOL_*
+# settings, which config.py reads from the environment. The limits apply
+# to each worker process, so Postgres sees up to
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections. With
+# DB_PGBOUNCER set, the app keeps no pool of its own (NullPool). Each
+# checkout then opens a connection to PgBouncer, which must run in
+# transaction pooling mode and does the pooling itself.
+#
+# Checkouts are timed. /admin/pool reports the wait times and the
+# saturation of the answering worker's pools: the primary, the replica
+# binds and, under asgi.py, the async engines.
+#----------------------------------------------------------------------------#
+
+class PoolStats:
+    """Checkout wait times of this process, the last `window` kept for percentiles."""
+
+    def __init__(self, window=1024):
+        self.lock = threading.Lock()
+        self.recent = collections.deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, wait, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.recent.append(wait)
+
+    def snapshot(self):
+        with self.lock:
+            recent = sorted(self.recent)
+            percentile = lambda fraction: recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000 if recent else None
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms': {
+                    'mean': self.total_wait / self.checkouts * 1000 if self.checkouts else None,
+                    'p50': percentile(0.5),
+                    'p99': percentile(0.99),
+                    'max': self.max_wait * 1000,
+                },
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedCheckout:
+    """Pool mixin recording how long getting a connection takes."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_stats.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.observe(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(TimedCheckout, QueuePool):
+    pass
+
+
+class TimedNullPool(TimedCheckout, NullPool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database and pool settings."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # SQLite picks its own pool, the settings are for server databases
+        return options
+    if config.get('DB_PGBOUNCER'):
+        options.setdefault('poolclass', TimedNullPool)
+        return options
+    options.setdefault('poolclass', TimedQueuePool)
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    return options
+
+
+def _usage(pool):
+    if not isinstance(pool, QueuePool):
+        return {'pool': type(pool).__name__}
+    capacity = pool.size() + pool._max_overflow
+    return {
+        'pool': type(pool).__name__,
+        'size': pool.size(),
+        'max_overflow': pool._max_overflow,
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(0, pool.overflow()),
+        'saturation': pool.checkedout() / float(capacity) if capacity > 0 else None,
+    }
+
+
+def pool_status():
+    """The primary's pool at the top, replica binds and async engines below."""
+    status = {
+        'pid': os.getpid(),
+        'pgbouncer': bool(current_app.config.get('DB_PGBOUNCER')),
+    }
+    status.update(_usage(db.engine.pool))
+    binds = {key: _usage(engine.pool) for key, engine in db.engines.items() if key is not None}
+    if binds:
+        status['binds'] = binds
+    # pools of the async engines of asgi.py, by bind key (None: the primary)
+    async_pools = current_app.extensions.get('async_pools', {})
+    if async_pools:
+        status['async'] = {key or 'primary': _usage(pool) for key, pool in async_pools.items()}
+    status.update(pool_stats.snapshot())
+    return status
+
+
+def admin_pool():
+    """Pool status of this worker, for requests with X-Admin-Token: <ADMIN_TOKEN>."""
+    token = current_app.config.get('ADMIN_TOKEN')
+    sent = request.headers.get('X-Admin-Token', '')
+    if not token or not hmac.compare_digest(sent.encode('utf-8'), token.encode('utf-8')):
+        abort(404)
+    return jsonify(pool_status())
+
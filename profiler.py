@@ -0,0 +1,106 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime
+from flask import current_app, g, request
+
+#----------------------------------------------------------------------------#
+# Opt-in request profiling.
+#
+# A request is profiled when it sends `X-Profile: <PROFILE_TOKEN>`, or when
+# it is picked at PROFILE_SAMPLE_RATE. Each profile is saved to PROFILE_DIR
+# as a .prof file named after the endpoint. Open it with `python -m pstats`
+# or snakeviz. The log gets a summary of where the time went:
+# - the database driver calls
+# - Jinja rendering, including the datetime filter
+# - the datetime filter on its own
+# - the remaining Python of the view
+# A request that sent the token also gets the summary back as
+# Server-Timing entries.
+#----------------------------------------------------------------------------#
+
+# (file suffix, function) pairs whose cumulative time is reported
+SPLITS = {
+    'db': [('sqlalchemy/engine/default.py', 'do_execute'),
+           ('sqlalchemy/engine/default.py', 'do_executemany'),
+           ('sqlalchemy/engine/default.py', 'do_execute_no_params')],
+    'render': [('flask/templating.py', 'render_template'),
+               ('flask/templating.py', 'stream_template')],
+    'datetime_filter': [('app.py', 'format_datetime')],
+}
+
+
+def time_split(stats, total):
+    """Seconds spent in the SPLITS functions, and the rest as 'view'."""
+    split = dict.fromkeys(SPLITS, 0.0)
+    for (filename, lineno, function), (cc, nc, tt, ct, callers) in stats.stats.items():
+        filename = filename.replace(os.sep, '/')
+        for name, functions in SPLITS.items():
+            if any(function == wanted and filename.endswith(suffix) for suffix, wanted in functions):
+                split[name] += ct
+    split['view'] = max(0.0, total - split['db'] - split['render'])
+    return split
+
+
+class RequestProfiler:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('PROFILE_TOKEN') and not app.config.get('PROFILE_SAMPLE_RATE'):
+            return
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    @staticmethod
+    def requested():
+        token = current_app.config.get('PROFILE_TOKEN')
+        sent = request.headers.get('X-Profile')
+        return bool(token and sent and hmac.compare_digest(sent.encode('utf-8'), token.encode('utf-8')))
+
+    def start(self):
+        requested = self.requested()
+        if not requested and random.random() >= current_app.config.get('PROFILE_SAMPLE_RATE', 0.0):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already active on this thread
+            return
+        g.profile = (profile, time.perf_counter(), requested)
+
+    def finish(self, response):
+        profiling = g.pop('profile', None)
+        if profiling is None:
+            return response
+        profile, started, requested = profiling
+        profile.disable()
+        total = time.perf_counter() - started
+
+        endpoint = request.endpoint or 'unmatched'
+        directory = current_app.config.get('PROFILE_DIR', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '%s-%s-%d-%.0fms.prof' % (
+            re.sub(r'[^\w.-]', '_', endpoint), datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid(), total * 1000))
+        profile.dump_stats(path)
+
+        split = time_split(pstats.Stats(profile), total)
+        current_app.logger.info(
+            'profiled %s %s in %.1fms: view %.1fms, render %.1fms (datetime filter %.1fms), db %.1fms -> %s',
+            request.method, request.full_path.rstrip('?'), total * 1000, split['view'] * 1000,
+            split['render'] * 1000, split['datetime_filter'] * 1000, split['db'] * 1000, path)
+        if requested:
+            for name in ('view', 'render', 'datetime_filter', 'db'):
+                response.headers.add('Server-Timing', 'prof-%s;dur=%.1f' % (name.replace('_', '-'), split[name] * 1000))
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,97 @@
+from sqlalchemy import func
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Projected queries shared by the HTML pages and the JSON API.
+#
+# Each entity has a map of public field names to columns. A query selects
+# only the fields it is asked for (each labelled with its field name) plus
+# the columns its caller orders or pages by, so rows can be read by field
+# name and nothing else is loaded.
+#----------------------------------------------------------------------------#
+
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'website': Venue.website,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'seeking': Venue.seeking,
+    'seeking_description': Venue.seeking_description,
+    'num_upcoming_shows': Venue.upcoming_shows_count,
+    'num_past_shows': Venue.past_shows_count,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'website': Artist.website,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'seeking': Artist.seeking,
+    'seeking_description': Artist.seeking_description,
+    'num_upcoming_shows': Artist.upcoming_shows_count,
+    'num_past_shows': Artist.past_shows_count,
+}
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'start_time': Show.time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+
+def project(fields, names, keys=()):
+    """Columns of the field names labelled as such, plus the key columns."""
+    columns = [fields[name].label(name) for name in names]
+    columns += [key for key in keys if key.key not in names]
+    return columns
+
+
+# Order of the /venues listing: by area, then by name. State is nullable and
+# NULL would break the row comparisons of keyset paging, so it is compared
+# as ''.
+VENUE_AREA_ORDER = [func.coalesce(Venue.state, '').label('area_state'), Venue.city, Venue.name, Venue.id]
+
+
+def venues_query(names, keys=()):
+    return db.session.query(*project(VENUE_FIELDS, names, keys))
+
+
+def artists_query(names, keys=()):
+    return db.session.query(*project(ARTIST_FIELDS, names, keys))
+
+
+def shows_query(names, keys=()):
+    """Shows with only the venue/artist joins that the fields need."""
+    query = db.session.query(*project(SHOW_FIELDS, names, keys)).select_from(Show)
+    tables = {SHOW_FIELDS[name].expression.table for name in names}
+    if Venue.__table__ in tables:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    if Artist.__table__ in tables:
+        query = query.join(Artist, Show.artist_id == Artist.id)
+    return query
+
+
+def venue_shows_query(venue_id, names):
+    """Shows of a venue that have a time, in time order."""
+    return shows_query(names).filter(Show.venue_id == venue_id, Show.time.isnot(None)
+      ).order_by(Show.time)
+
+
+def artist_shows_query(artist_id, names):
+    """Shows of an artist that have a time, in time order."""
+    return shows_query(names).filter(Show.artist_id == artist_id, Show.time.isnot(None)
+      ).order_by(Show.time)
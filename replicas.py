@@ -0,0 +1,96 @@
+import itertools
+import time
+from flask import current_app, g, request, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# DATABASE_REPLICA_URLS (config.py) become the binds replica_0, replica_1,
+# ... Requests to the endpoints in REPLICA_ENDPOINTS read from one of them,
+# picked per request by DB_REPLICA_SELECTION: 'round-robin', or
+# 'least-loaded' for the replica with the fewest checked-out connections in
+# this worker, async engines of asgi.py included. Flushes and INSERT/UPDATE/DELETE statements always go to the
+# primary, and so does every other endpoint.
+#
+# A request that writes pins its client to the primary for
+# REPLICA_PIN_SECONDS with a cookie holding the time the pin ends. The
+# redirect after a form post then shows the new data even while the
+# replicas lag behind, and does not take its page from the page cache. The cookie is not signed: all a client can do with
+# it is keep itself on the primary.
+#----------------------------------------------------------------------------#
+
+PIN_COOKIE = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    """Session reading from the replica chosen for the request."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif g.get('db_replica') is not None:
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+
+    def __init__(self, app=None):
+        self.keys = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica_'))
+        if not self.keys:
+            return
+        self.endpoints = set(app.config.get('REPLICA_ENDPOINTS', ()))
+        self.selection = app.config.get('DB_REPLICA_SELECTION', 'round-robin')
+        self.pin_seconds = app.config.get('REPLICA_PIN_SECONDS', 10)
+        self.counter = itertools.count()
+        app.before_request(self.route)
+        app.after_request(self.pin)
+
+    def select(self):
+        # rotate the starting point so ties between replicas are spread too
+        start = next(self.counter) % len(self.keys)
+        keys = self.keys[start:] + self.keys[:start]
+        if self.selection != 'least-loaded':
+            return keys[0]
+        engines = current_app.extensions['sqlalchemy'].engines
+        # under asgi.py a replica also has the pool of its async engine
+        async_pools = current_app.extensions.get('async_pools', {})
+
+        def load(key):
+            pools = [engines[key].pool] + ([async_pools[key]] if key in async_pools else [])
+            return sum(getattr(pool, 'checkedout', lambda: 0)() for pool in pools)
+        return min(keys, key=load)
+
+    def route(self):
+        if request.endpoint not in self.endpoints:
+            return
+        if self.pinned():
+            # the page cache may hold a page rendered from a lagging replica
+            # since the write, so pinned requests skip it too (cache.py)
+            g.db_pinned = True
+            return
+        g.db_replica = self.select()
+
+    @staticmethod
+    def pinned():
+        try:
+            return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def pin(self, response):
+        if g.pop('db_wrote', False):
+            response.set_cookie(PIN_COOKIE, '%.3f' % (time.time() + self.pin_seconds),
+                                max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,248 @@
+import bisect
+import re
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event, func, literal_column, cast, Float, Numeric, BigInteger
+from sqlalchemy.orm import object_session
+from models import db, Venue, Artist
+from pagination import Page, keyset_page, get_page_size, estimate_count, encode_cursor, decode_cursor
+
+#----------------------------------------------------------------------------#
+# Search for venues and artists by name, city and state.
+#
+# On PostgreSQL the search runs against the generated `search_vector`
+# tsvector column (GIN indexed) and a trigram index on `name`, see the
+# migration 9c1e5b7f3a21. Everywhere else (SQLite in tests) an in-process
+# inverted index is used, built on first use and kept up to date on commit.
+#----------------------------------------------------------------------------#
+
+SearchResult = namedtuple('SearchResult', ['id', 'name', 'score', 'num_upcoming_shows'])
+
+# pg_trgm's default similarity threshold for the % operator
+SIMILARITY_THRESHOLD = 0.3
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def trigrams(text):
+    """Trigrams of text the way pg_trgm builds them (per word, padded)."""
+    grams = set()
+    for word in tokenize(text):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+def search_entities(model, term, after=None, before=None, page_size=None):
+    """Return (page, count) of venues or artists matching term, best first."""
+    page_size = page_size or get_page_size()
+    if not tokenize(term):
+        # nothing to rank by, list everything by name
+        query = db.session.query(model.id, model.name,
+                                 model.upcoming_shows_count.label('num_upcoming_shows'))
+        page = keyset_page(query, [model.name, model.id], after=after, before=before,
+                           page_size=page_size)
+        return page, estimate_count(model)
+    if get_backend() == 'postgresql':
+        return _search_postgresql(model, term, after, before, page_size)
+    return get_memory_index(model).search(term, after, before, page_size)
+
+
+def get_backend():
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return 'postgresql' if db.engine.dialect.name == 'postgresql' else 'memory'
+    return backend
+
+#----------------------------------------------------------------------------#
+# PostgreSQL backend.
+#----------------------------------------------------------------------------#
+
+def _search_postgresql(model, term, after, before, page_size):
+    vector = literal_column('"%s".search_vector' % model.__tablename__)
+    # every word of the term has to match as a prefix of an indexed word
+    tsquery = func.to_tsquery('simple', ' & '.join(token + ':*' for token in tokenize(term)))
+    matches = vector.op('@@')(tsquery) | model.name.op('%')(term)
+    rank = func.ts_rank(vector, tsquery, type_=Float) + func.similarity(model.name, term, type_=Float)
+    # keyset pagination walks ascending keys, so sort on the negated rank.
+    # The float rank would not compare equal to its own value after the
+    # round trip through the cursor, so the key is the rank in whole
+    # millionths, an integer that survives JSON exactly.
+    score = cast(func.round(cast(-rank, Numeric) * 1000000), BigInteger).label('score')
+
+    query = db.session.query(model.id, model.name, score,
+                             model.upcoming_shows_count.label('num_upcoming_shows')).filter(matches)
+    page = keyset_page(query, [score, model.id], after=after, before=before,
+                       page_size=page_size)
+    count = db.session.query(func.count(model.id)).filter(matches).scalar()
+    return page, count
+
+#----------------------------------------------------------------------------#
+# In-process inverted index.
+#----------------------------------------------------------------------------#
+
+class InvertedIndex:
+    """Word and trigram postings of one model's name, city and state."""
+
+    def __init__(self, model):
+        self.model = model
+        self.docs = {}
+        self.words = {}
+        self.sorted_words = []
+        self.grams = {}
+
+    def build(self):
+        rows = db.session.query(self.model.id, self.model.name, self.model.city,
+                                self.model.state).all()
+        for row in rows:
+            self.add(row.id, row.name, row.city, row.state)
+        return self
+
+    def add(self, id, name, city, state):
+        if id in self.docs:
+            self.remove(id)
+        words = set(tokenize(name)) | set(tokenize(city)) | set(tokenize(state))
+        name_grams = trigrams(name)
+        self.docs[id] = (name, words, name_grams)
+        for word in words:
+            if word not in self.words:
+                bisect.insort(self.sorted_words, word)
+                self.words[word] = set()
+            self.words[word].add(id)
+        for gram in name_grams:
+            self.grams.setdefault(gram, set()).add(id)
+
+    def remove(self, id):
+        doc = self.docs.pop(id, None)
+        if doc is None:
+            return
+        name, words, name_grams = doc
+        for word in words:
+            self.words[word].discard(id)
+            if not self.words[word]:
+                del self.words[word]
+                del self.sorted_words[bisect.bisect_left(self.sorted_words, word)]
+        for gram in name_grams:
+            self.grams[gram].discard(id)
+            if not self.grams[gram]:
+                del self.grams[gram]
+
+    def _prefix_matches(self, token):
+        ids = set()
+        start = bisect.bisect_left(self.sorted_words, token)
+        for word in self.sorted_words[start:]:
+            if not word.startswith(token):
+                break
+            ids |= self.words[word]
+        return ids
+
+    def ranked(self, term):
+        tokens = tokenize(term)
+        matches = None
+        for token in tokens:
+            ids = self._prefix_matches(token)
+            matches = ids if matches is None else matches & ids
+        term_grams = trigrams(term)
+        candidates = set()
+        for gram in term_grams:
+            candidates |= self.grams.get(gram, set())
+
+        results = []
+        for id in candidates | matches:
+            name, words, name_grams = self.docs[id]
+            sim = similarity(term_grams, name_grams)
+            if id not in matches and sim < SIMILARITY_THRESHOLD:
+                continue
+            score = sim + (1.0 if id in matches else 0.0)
+            results.append(SearchResult(id, name, -score, 0))
+        results.sort(key=lambda result: (result.score, result.id))
+        return results
+
+    def search(self, term, after=None, before=None, page_size=None):
+        results = self.ranked(term)
+        keys = [(result.score, result.id) for result in results]
+        after_key = _decode_key(after)
+        before_key = _decode_key(before) if after_key is None else None
+        if before_key is not None:
+            end = bisect.bisect_left(keys, before_key)
+            start = max(0, end - page_size)
+        else:
+            start = bisect.bisect_right(keys, after_key) if after_key is not None else 0
+            end = start + page_size
+        items = results[start:end]
+        if items:
+            # the index holds no counters, look them up for this page only
+            counts = dict(db.session.query(self.model.id, self.model.upcoming_shows_count
+                ).filter(self.model.id.in_([item.id for item in items])))
+            items = [item._replace(num_upcoming_shows=counts.get(item.id, 0)) for item in items]
+        return Page(items,
+                    next_cursor=encode_cursor(keys[end - 1]) if items and end < len(keys) else None,
+                    prev_cursor=encode_cursor(keys[start]) if items and start > 0 else None
+                    ), len(results)
+
+
+def _decode_key(cursor):
+    key = decode_cursor(cursor)
+    if not key or len(key) != 2:
+        return None
+    return tuple(key)
+
+
+_memory_indexes = {}
+
+
+def get_memory_index(model):
+    if model not in _memory_indexes:
+        _memory_indexes[model] = InvertedIndex(model).build()
+    return _memory_indexes[model]
+
+
+def reset_memory_indexes():
+    _memory_indexes.clear()
+
+#----------------------------------------------------------------------------#
+# Keep the in-process indexes in step with committed writes.
+#----------------------------------------------------------------------------#
+
+def _record_change(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search_changes', []).append(
+            (type(target), target.id, (target.name, target.city, target.state)))
+
+
+def _record_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('search_changes', []).append((type(target), target.id, None))
+
+
+def _apply_changes(session):
+    for model, id, fields in session.info.pop('search_changes', []):
+        index = _memory_indexes.get(model)
+        if index is None:
+            continue
+        if fields is None:
+            index.remove(id)
+        else:
+            index.add(id, *fields)
+
+
+def _discard_changes(session, *args):
+    session.info.pop('search_changes', None)
+
+
+for _model in (Venue, Artist):
+    event.listen(_model, 'after_insert', _record_change)
+    event.listen(_model, 'after_update', _record_change)
+    event.listen(_model, 'after_delete', _record_delete)
+event.listen(db.session, 'after_commit', _apply_changes)
+event.listen(db.session, 'after_soft_rollback', _discard_changes)
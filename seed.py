@@ -0,0 +1,189 @@
+import itertools
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from models import db, Venue, Artist, Show, venue_genre_table, artist_genre_table
+from genres import resolve_genre_ids
+from counters import recount
+from enums import Genre, State
+
+#----------------------------------------------------------------------------#
+# Synthetic dataset for benchmarks and capacity planning.
+#
+# `flask seed --scale N` writes N * 100 venues, N * 200 artists and
+# N * 2000 shows. The same scale and seed always give the same rows. Show
+# times are offsets from --start, which defaults to today.
+#
+# The data is skewed on purpose. Popularity of states, venues, artists and
+# genres follows a Zipf-like curve, so a few venues host most shows. About
+# a tenth of the artists tour nationally, while the others only play
+# venues in their home state. Three out of five shows are in the past.
+#----------------------------------------------------------------------------#
+
+VENUES_PER_SCALE = 100
+ARTISTS_PER_SCALE = 200
+SHOWS_PER_SCALE = 2000
+TOURING_SHARE = 0.1
+PAST_SHARE = 0.6
+BATCH_SIZE = 5000
+
+CITY_NAMES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Bristol',
+              'Clinton', 'Fairview', 'Salem', 'Madison', 'Georgetown']
+ADJECTIVES = ['Velvet', 'Electric', 'Golden', 'Blue', 'Crimson', 'Silver', 'Lucky', 'Wild',
+              'Hollow', 'Midnight', 'Rusty', 'Neon', 'Painted', 'Broken', 'Northern', 'Humble']
+NOUNS = ['Lantern', 'Anchor', 'Fox', 'Owl', 'Canyon', 'Harbor', 'Engine', 'Garden',
+         'Mirror', 'Compass', 'Raven', 'Meadow', 'Bridge', 'Comet', 'Thistle', 'Drum']
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Theatre', 'Bar', 'Room', 'Arena', 'Tavern']
+ARTIST_KINDS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project', 'Brothers', 'Sisters']
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights of count items, the first ones the most popular."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def pick(rnd, items, cum_weights):
+    return items[bisect(cum_weights, rnd.random() * cum_weights[-1])]
+
+
+def _insert(table, rows):
+    """Bulk insert rows, returns their generated ids in order."""
+    ids = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        ids += db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True),
+            rows[start:start + BATCH_SIZE]
+        ).scalars().all()
+    return ids
+
+
+def _link_genres(table, owner_column, owner_ids, genre_lists, genre_ids):
+    links = [{owner_column: owner_id, 'genre_id': genre_ids[genre]}
+             for owner_id, genres in zip(owner_ids, genre_lists) for genre in genres]
+    for start in range(0, len(links), BATCH_SIZE):
+        db.session.execute(table.insert(), links[start:start + BATCH_SIZE])
+
+
+def _profile(rnd, name, state, city, genres, genre_weights):
+    chosen = {pick(rnd, genres, genre_weights) for _ in range(rnd.randint(1, 3))}
+    slug = name.lower().replace(' ', '')
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': '%03d-%03d-%04d' % (rnd.randint(200, 999), rnd.randint(200, 999), rnd.randint(0, 9999)),
+        'website': 'https://www.%s.com' % slug,
+        'facebook_link': 'https://www.facebook.com/%s' % slug,
+        'image_link': 'https://picsum.photos/seed/%s/300/300' % slug,
+        'seeking': rnd.random() < 0.3,
+        'seeking_description': None,
+    }, sorted(chosen)
+
+
+def generate(scale, seed=0, start=None, echo=click.echo):
+    """Write the dataset of scale into the database (not committed)."""
+    rnd = random.Random(seed)
+    start = start or datetime.combine(datetime.now().date(), datetime.min.time())
+    num_venues = VENUES_PER_SCALE * scale
+    num_artists = ARTISTS_PER_SCALE * scale
+    num_shows = SHOWS_PER_SCALE * scale
+    started = time.perf_counter()
+
+    states = [state.value for state in State]
+    rnd.shuffle(states)
+    state_weights = zipf_weights(len(states), 0.8)
+    genres = [genre.name for genre in Genre]
+    rnd.shuffle(genres)
+    genre_weights = zipf_weights(len(genres), 0.9)
+    genre_ids = dict(zip(genres, resolve_genre_ids(genres)))
+
+    venues, venue_genres = [], []
+    for _ in range(num_venues):
+        state = pick(rnd, states, state_weights)
+        name = 'The %s %s %s' % (rnd.choice(ADJECTIVES), rnd.choice(NOUNS), rnd.choice(VENUE_KINDS))
+        venue, chosen = _profile(rnd, name, state, rnd.choice(CITY_NAMES), genres, genre_weights)
+        venue['address'] = '%d %s St' % (rnd.randint(1, 9999), rnd.choice(NOUNS))
+        venues.append(venue)
+        venue_genres.append(chosen)
+    venue_ids = _insert(Venue.__table__, venues)
+    _link_genres(venue_genre_table, 'venue_id', venue_ids, venue_genres, genre_ids)
+    echo('%d venues' % num_venues)
+
+    artists, artist_genres = [], []
+    for _ in range(num_artists):
+        state = pick(rnd, states, state_weights)
+        name = '%s %s %s' % (rnd.choice(ADJECTIVES), rnd.choice(NOUNS), rnd.choice(ARTIST_KINDS))
+        artist, chosen = _profile(rnd, name, state, rnd.choice(CITY_NAMES), genres, genre_weights)
+        artists.append(artist)
+        artist_genres.append(chosen)
+    artist_ids = _insert(Artist.__table__, artists)
+    _link_genres(artist_genre_table, 'artist_id', artist_ids, artist_genres, genre_ids)
+    echo('%d artists' % num_artists)
+
+    # venue and artist popularity, plus each state's venues for local artists
+    venue_weights = zipf_weights(num_venues)
+    artist_weights = zipf_weights(num_artists)
+    local_venues = {}
+    for position, venue in enumerate(venues):
+        local_venues.setdefault(venue['state'], []).append(position)
+    local_weights = {state: zipf_weights(len(positions)) for state, positions in local_venues.items()}
+    touring = set(rnd.sample(range(num_artists), max(1, int(num_artists * TOURING_SHARE))))
+
+    positions = list(range(num_artists))
+    batch = []
+    for _ in range(num_shows):
+        artist = pick(rnd, positions, artist_weights)
+        state = artists[artist]['state']
+        if artist in touring or state not in local_venues:
+            venue = pick(rnd, range(num_venues), venue_weights)
+        else:
+            venue = pick(rnd, local_venues[state], local_weights[state])
+        if rnd.random() < PAST_SHARE:
+            days = -rnd.randint(1, 730)
+        else:
+            days = rnd.randint(0, 365)
+        batch.append({
+            'venue_id': venue_ids[venue],
+            'artist_id': artist_ids[artist],
+            'time': start + timedelta(days=days, hours=rnd.randint(19, 22), minutes=rnd.choice((0, 30))),
+        })
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(Show.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Show.__table__.insert(), batch)
+    echo('%d shows' % num_shows)
+
+    # the shows were inserted directly, bring the counters up to date
+    recount()
+    echo('done in %.1fs' % (time.perf_counter() - started))
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('seed')
+@click.option('--scale', default=1, show_default=True,
+              help='Size of the dataset, in units of %d venues, %d artists and %d shows.'
+                   % (VENUES_PER_SCALE, ARTISTS_PER_SCALE, SHOWS_PER_SCALE))
+@click.option('--seed', default=0, show_default=True, help='Random seed.')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Date the show times are relative to, today by default.')
+@click.option('--reset', is_flag=True, help='Delete all venues, artists and shows first.')
+@with_appcontext
+def seed_command(scale, seed, start, reset):
+    """Generate a synthetic dataset of venues, artists and shows."""
+    if db.engine.dialect.name != 'postgresql':
+        # the migrations are PostgreSQL only, create the tables directly
+        db.create_all()
+    if reset:
+        db.session.execute(Show.__table__.delete())
+        for table in (venue_genre_table, artist_genre_table, Venue.__table__, Artist.__table__):
+            db.session.execute(table.delete())
+    elif db.session.query(Venue.id).first() is not None:
+        raise click.UsageError('the database already holds venues, use --reset to replace them')
+    generate(scale, seed, start)
+    db.session.commit()
@@ -0,0 +1,204 @@
+import glob
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Slow-query log.
+#
+# Statements that take longer than SLOW_QUERY_MS are written to a rotating
+# JSON-lines log. Each entry holds the SQL, its parameters, the Flask
+# endpoint it came from and the plan of the statement (EXPLAIN without
+# ANALYZE, so nothing runs twice). Plans are taken at most once per
+# SLOW_QUERY_EXPLAIN_INTERVAL for each statement fingerprint, so a burst
+# of one slow statement cannot double the load. `flask slow-queries`
+# ranks the fingerprints of the log by total time.
+#----------------------------------------------------------------------------#
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+
+def fingerprint(statement):
+    """The statement with literals and IN lists collapsed, and its short hash."""
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    normalized = re.sub(r'\b\d+(\.\d+)?\b', '?', normalized)
+    normalized = re.sub(r'%\(\w+\)s|%s|:\w+', '?', normalized)
+    normalized = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(...)', normalized)
+    normalized = ' '.join(normalized.split())
+    return normalized, hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def _short(value, limit=200):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+class SlowQueryLog:
+
+    def __init__(self, app=None):
+        self.threshold = None
+        self.logger = logging.getLogger('fyyur.slow_queries')
+        self.logger.propagate = False
+        self.explained = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        threshold = app.config.get('SLOW_QUERY_MS')
+        if threshold is None:
+            return
+        self.threshold = threshold / 1000.0
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.explain_interval = app.config.get('SLOW_QUERY_EXPLAIN_INTERVAL', 60)
+        self.path = app.config.get('SLOW_QUERY_LOG', 'slow_queries.log')
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(self.path,
+                                          maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                          backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5),
+                                          delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('slow_query_started'):
+            connection.info['slow_query_started'].pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slow_query_started'].pop()
+        if elapsed >= self.threshold:
+            self.record(conn, statement, parameters, executemany, elapsed)
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        key = fingerprint(statement)[1]
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'fingerprint': key,
+            'duration_ms': round(elapsed * 1000, 2),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'path': request.path if has_request_context() else None,
+            'statement': statement,
+            'parameters': self._parameters(parameters, executemany),
+            'plan': None,
+        }
+        now = time.monotonic()
+        if (self.explain and not executemany and EXPLAINABLE.match(statement)
+                and now - self.explained.get(key, -self.explain_interval) >= self.explain_interval):
+            self.explained[key] = now
+            entry['plan'] = self._explain(conn, statement, parameters)
+        self.logger.info(json.dumps(entry, default=str))
+
+    @staticmethod
+    def _parameters(parameters, executemany):
+        if executemany:
+            return '%d parameter sets' % len(parameters)
+        if isinstance(parameters, dict):
+            return {name: _short(value) for name, value in parameters.items()}
+        return [_short(value) for value in parameters or ()]
+
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        # a separate DBAPI cursor: no events, and the results of the slow
+        # statement's own cursor stay untouched
+        if conn.dialect.name == 'postgresql':
+            prefix = 'EXPLAIN (ANALYZE off, FORMAT TEXT) '
+        elif conn.dialect.name == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        else:
+            prefix = 'EXPLAIN '
+        # the cursor shares the request's transaction, which a failed
+        # EXPLAIN would leave aborted on Postgres; a savepoint contains it
+        savepoint = (conn.dialect.name == 'postgresql'
+                     and not getattr(conn.connection.dbapi_connection, 'autocommit', False))
+        cursor = conn.connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [' '.join(str(value) for value in row) for row in cursor.fetchall()]
+            except Exception as error:
+                if savepoint:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                plan = ['EXPLAIN failed: %s' % error]
+            if savepoint:
+                cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return plan
+        except Exception as error:
+            return ['EXPLAIN failed: %s' % error]
+        finally:
+            cursor.close()
+
+
+slow_query_log = SlowQueryLog()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def read_entries(path):
+    """Entries of the log and its rotated files, oldest file first."""
+    rotated = [name for name in glob.glob(glob.escape(path) + '.*') if name.rsplit('.', 1)[1].isdigit()]
+    rotated.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    for name in rotated + [path]:
+        try:
+            with open(name, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+@click.command('slow-queries')
+@click.option('--top', default=10, show_default=True, help='Number of fingerprints to show.')
+@click.option('--log', 'path', help='Log file, SLOW_QUERY_LOG by default.')
+@with_appcontext
+def slow_queries_command(top, path):
+    """Summarize the slow-query log by statement fingerprint."""
+    path = path or current_app.config.get('SLOW_QUERY_LOG', 'slow_queries.log')
+    groups = {}
+    for entry in read_entries(path):
+        group = groups.setdefault(entry['fingerprint'], {
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': {}, 'entry': entry})
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+        if entry.get('plan'):
+            group['entry'] = entry
+        endpoint = entry.get('endpoint') or '-'
+        group['endpoints'][endpoint] = group['endpoints'].get(endpoint, 0) + 1
+    if not groups:
+        click.echo('no slow queries in %s' % path)
+        return
+    ranked = sorted(groups.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]
+    for key, group in ranked:
+        entry = group['entry']
+        click.echo('%s  %d x, total %.0fms, mean %.1fms, max %.1fms' % (
+            key, group['count'], group['total_ms'], group['total_ms'] / group['count'], group['max_ms']))
+        click.echo('  endpoints: ' + ', '.join('%s (%d)' % item for item in
+                                               sorted(group['endpoints'].items(), key=lambda item: -item[1])))
+        click.echo('  ' + fingerprint(entry['statement'])[0][:300])
+        for line in entry.get('plan') or []:
+            click.echo('    ' + line)
+        click.echo('')
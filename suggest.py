@@ -0,0 +1,216 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from flask import current_app
+from sqlalchemy import event
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Autocomplete suggestions for venue and artist names.
+#
+# Every name is kept in a sorted array under each of its word starts
+# ("the musical hop", "musical hop", "hop"), so a prefix lookup is a
+# binary search plus a scan of the matches. Prefixes of up to
+# MEMO_PREFIX_LENGTH characters match a large share of all names, so their
+# best MEMO_SIZE entries are kept between lookups until an entry under the
+# prefix changes.
+#
+# The indexes are built from the database when the server starts
+# (`python app.py` and asgi.py call build_indexes()); under other WSGI
+# servers each worker builds them on its first lookup. They are then kept
+# current by the create/edit/delete handlers of the worker, and upcoming
+# show counts follow the counter updates of counters.py once their
+# transaction commits. Every SUGGEST_REFRESH_SECONDS the index is
+# reconciled with the id, name and upcoming show count of every row, which
+# picks up the writes of other workers, `flask import`, `flask seed` and
+# `flask counters roll-forward`.
+#----------------------------------------------------------------------------#
+
+MEMO_PREFIX_LENGTH = 3
+MEMO_SIZE = 100
+
+def normalize(name):
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', name.lower()))
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs of normalized names with upcoming show counts."""
+
+    def __init__(self):
+        self.keys = []
+        self.entries = {}
+        self.memo = {}
+        self.refreshed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _word_starts(normalized):
+        words = normalized.split(' ')
+        return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+    def add(self, id, name, num_upcoming_shows=None):
+        with self.lock:
+            self._add(id, name, num_upcoming_shows)
+
+    def _add(self, id, name, num_upcoming_shows):
+        entry = self.entries.get(id)
+        if entry is not None:
+            if num_upcoming_shows is None:
+                num_upcoming_shows = entry[2]
+            self._remove(id)
+        normalized = normalize(name)
+        self.entries[id] = [normalized, name, num_upcoming_shows or 0]
+        for key in self._word_starts(normalized):
+            bisect.insort(self.keys, (key, id))
+        self._forget(normalized)
+
+    def remove(self, id):
+        with self.lock:
+            self._remove(id)
+
+    def _remove(self, id):
+        entry = self.entries.pop(id, None)
+        if entry is None:
+            return
+        for key in self._word_starts(entry[0]):
+            position = bisect.bisect_left(self.keys, (key, id))
+            if position < len(self.keys) and self.keys[position] == (key, id):
+                del self.keys[position]
+        self._forget(entry[0])
+
+    def _forget(self, normalized):
+        """Drop the memoized results of the short prefixes of a name."""
+        if self.memo:
+            for key in self._word_starts(normalized):
+                for length in range(1, MEMO_PREFIX_LENGTH + 1):
+                    self.memo.pop(key[:length], None)
+
+    def add_upcoming_shows(self, deltas):
+        """Apply {id: delta} changes to the upcoming show counts."""
+        with self.lock:
+            for id, delta in deltas.items():
+                entry = self.entries.get(id)
+                if entry is not None and delta:
+                    entry[2] = max(0, entry[2] + delta)
+                    self._forget(entry[0])
+
+    def reconcile(self, rows):
+        """Bring the index in line with all (id, name, num_upcoming_shows) rows."""
+        with self.lock:
+            ids = set()
+            for id, name, num_upcoming_shows in rows:
+                ids.add(id)
+                entry = self.entries.get(id)
+                if entry is None or entry[1] != name:
+                    self._add(id, name, num_upcoming_shows)
+                elif entry[2] != (num_upcoming_shows or 0):
+                    entry[2] = num_upcoming_shows or 0
+                    self._forget(entry[0])
+            for id in set(self.entries) - ids:
+                self._remove(id)
+            self.refreshed_at = time.monotonic()
+
+    def _best(self, prefix, limit):
+        ids = set()
+        position = bisect.bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            ids.add(self.keys[position][1])
+            position += 1
+        # most upcoming shows first, then alphabetical
+        return heapq.nsmallest(limit, ids, key=lambda id: (-self.entries[id][2],
+                                                           self.entries[id][0], id))
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix or limit < 1:
+            return []
+        with self.lock:
+            if len(prefix) <= MEMO_PREFIX_LENGTH and limit <= MEMO_SIZE:
+                if prefix not in self.memo:
+                    self.memo[prefix] = self._best(prefix, MEMO_SIZE)
+                best = self.memo[prefix][:limit]
+            else:
+                best = self._best(prefix, limit)
+            return [{
+                'id': id,
+                'name': self.entries[id][1],
+                'num_upcoming_shows': self.entries[id][2]
+            } for id in best]
+
+
+SUGGEST_TYPES = {
+    'venue': Venue,
+    'artist': Artist,
+}
+
+_indexes = {}
+_build_lock = threading.Lock()
+
+
+def _rows(type):
+    model = SUGGEST_TYPES[type]
+    return db.session.query(model.id, model.name, model.upcoming_shows_count).all()
+
+
+def build_index(type):
+    index = PrefixIndex()
+    for id, name, num_upcoming_shows in _rows(type):
+        index.add(id, name, num_upcoming_shows)
+    return index
+
+
+def build_indexes():
+    """Build every index ahead of the first lookup, at server start."""
+    for type in SUGGEST_TYPES:
+        get_index(type)
+
+
+def get_index(type):
+    if type not in _indexes:
+        with _build_lock:
+            if type not in _indexes:
+                _indexes[type] = build_index(type)
+    index = _indexes[type]
+    interval = current_app.config.get('SUGGEST_REFRESH_SECONDS', 60)
+    if time.monotonic() - index.refreshed_at >= interval:
+        with _build_lock:
+            if time.monotonic() - index.refreshed_at >= interval:
+                index.reconcile(_rows(type))
+    return index
+
+
+def update_suggestion(type, id, name):
+    """Add or rename an entry, no-op until the index has been built."""
+    if type in _indexes:
+        _indexes[type].add(id, name)
+
+
+def remove_suggestion(type, id):
+    if type in _indexes:
+        _indexes[type].remove(id)
+
+
+def reset_indexes():
+    _indexes.clear()
+
+
+def _apply_upcoming_show_deltas(session):
+    # {(type, id): delta} collected by counters._adjust in the transaction
+    deltas = session.info.pop('upcoming_show_deltas', None)
+    if deltas:
+        for type, index in list(_indexes.items()):
+            index.add_upcoming_shows({id: delta for (delta_type, id), delta in deltas.items()
+                                      if delta_type == type})
+
+
+def _discard_upcoming_show_deltas(session, *args):
+    session.info.pop('upcoming_show_deltas', None)
+
+
+event.listen(db.session, 'after_commit', _apply_upcoming_show_deltas)
+event.listen(db.session, 'after_soft_rollback', _discard_upcoming_show_deltas)